@@ -0,0 +1,175 @@
+import logging
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Quality levels ordered from cheapest to most expensive. Each level sets the capture
+# resolution, the width of the frame handed to MediaPipe and the model complexity.
+DEFAULT_LEVELS = [
+    {"width": 320, "height": 240, "inferWidth": 160, "modelComplexity": 0},
+    {"width": 320, "height": 240, "inferWidth": 320, "modelComplexity": 0},
+    {"width": 320, "height": 240, "inferWidth": 320, "modelComplexity": 1},
+    {"width": 640, "height": 480, "inferWidth": 480, "modelComplexity": 1},
+    {"width": 640, "height": 480, "inferWidth": 640, "modelComplexity": 1},
+]
+
+
+class AutoTuner:
+    def __init__(self, targetFps=15, levels=None, startLevel=None, minConfidence=0.8,
+                 smoothing=0.1, downMargin=0.9, upMargin=1.3, holdFrames=30, cooldownFrames=60, retryFrames=600):
+        """
+        Initialize the AutoTuner, which adjusts capture and inference settings to hold a target FPS.
+        It is fed the processing time of a frame (inference and exercise logic), not the loop time: the loop
+        blocks on the camera, which delivers at most targetFps, so loop time never shows spare headroom.
+        The FPS it compares against the margins is the rate processing alone could sustain.
+        Args:
+            targetFps: Frame rate the tuner tries to hold.
+            levels: List of quality levels (see DEFAULT_LEVELS), ordered from cheapest to most expensive.
+            startLevel: Index of the initial level. Defaults to the middle level.
+            minConfidence: Landmark confidence below which quality is favoured over headroom.
+            smoothing: Weight of the newest sample in the frame time and confidence moving averages.
+            downMargin: Step down when the processing FPS drops below targetFps * downMargin.
+            upMargin: Step up when the processing FPS stays above targetFps * upMargin.
+            holdFrames: Number of consecutive frames a condition must hold before the level changes.
+            cooldownFrames: Number of frames after a change during which no further change is made.
+            retryFrames: Number of frames a level is not stepped up into after a step up into it had to be undone,
+                doubled on every further failed step up. Without it, a level whose neighbours lie on either side of
+                the margins (e.g. 20 fps below, 11 fps above at target 15) is left and re-entered forever.
+        """
+        self.targetFps = targetFps
+        self.levels = levels if levels is not None else DEFAULT_LEVELS
+        self.levelIndex = startLevel if startLevel is not None else len(self.levels) // 2
+        self.minConfidence = minConfidence
+        self.smoothing = smoothing
+        self.downMargin = downMargin
+        self.upMargin = upMargin
+        self.holdFrames = holdFrames
+        self.cooldownFrames = cooldownFrames
+
+        self.frameTime = None  # Moving average of the frame processing time in seconds
+        self.confidence = None  # Moving average of the landmark confidence
+        self.downCount = 0
+        self.upCount = 0
+        self.cooldown = cooldownFrames
+        self.retryFrames = retryFrames
+        self.frames = 0  # Frames fed so far
+        self.lastStep = 0  # Direction of the last level change
+        self.upFailures = {}  # Level index -> number of step ups into it that were undone
+        self.upBlockedUntil = {}  # Level index -> frame number before which it is not stepped up into
+
+    @property
+    def level(self):
+        return self.levels[self.levelIndex]
+
+    @property
+    def modelComplexity(self):
+        return self.level["modelComplexity"]
+
+    @property
+    def fps(self):
+        """Frame rate the current processing time could sustain."""
+        return 1 / self.frameTime if self.frameTime else 0
+
+    def applyCapture(self, cap):
+        """Apply the current level's capture resolution to an opened cv2.VideoCapture."""
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.level["width"])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.level["height"])
+        cap.set(cv2.CAP_PROP_FPS, self.targetFps)
+
+    def prepareInput(self, frame, pool=None):
+        """
+        Downscale a frame to the current level's inference width.
+        Landmarks are normalized, so results computed on the smaller frame can be drawn on the original.
+        Args:
+            frame: The captured frame.
+            pool: Optional FrameBufferPool to resize into.
+        Returns:
+            The frame to pass to the landmark model.
+        """
+        h, w = frame.shape[:2]
+        inferWidth = self.level["inferWidth"]
+        if w <= inferWidth:
+            return frame
+        size = (inferWidth, int(h * inferWidth / w))
+        if pool is not None:
+            return pool.resize(frame, size, "inference")
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def confidenceFromResults(results):
+        """Return the hand detection score from MediaPipe results, or None if no hand was found."""
+        if not results.multi_handedness:
+            return None
+        return results.multi_handedness[0].classification[0].score
+
+    def update(self, frameTime, confidence=None):
+        """
+        Feed the processing time of one frame and the landmark confidence into the controller.
+        Args:
+            frameTime: Wall-clock time spent processing the last frame (inference and exercise logic) in
+                seconds, excluding the capture read and display wait.
+            confidence: Landmark confidence of the last frame, or None if no hand was detected.
+        Returns:
+            bool: True if the level changed and the caller should re-apply the settings.
+        """
+        if self.frameTime is None:
+            self.frameTime = frameTime
+        else:
+            self.frameTime += self.smoothing * (frameTime - self.frameTime)
+        if confidence is not None:
+            if self.confidence is None:
+                self.confidence = confidence
+            else:
+                self.confidence += self.smoothing * (confidence - self.confidence)
+
+        self.frames += 1
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+
+        fps = self.fps
+        lowConfidence = self.confidence is not None and self.confidence < self.minConfidence
+
+        # With poor landmarks, only give up quality when the frame rate is far off target,
+        # and take smaller headroom as enough to step up.
+        downLimit = self.targetFps * (self.downMargin - 0.2 if lowConfidence else self.downMargin)
+        upLimit = self.targetFps * (1 + (self.upMargin - 1) / 2 if lowConfidence else self.upMargin)
+
+        if fps < downLimit and self.levelIndex > 0:
+            self.downCount += 1
+            self.upCount = 0
+        elif (fps > upLimit and self.levelIndex < len(self.levels) - 1
+              and self.frames >= self.upBlockedUntil.get(self.levelIndex + 1, 0)):
+            self.upCount += 1
+            self.downCount = 0
+        else:
+            self.downCount = 0
+            self.upCount = 0
+
+        if self.downCount >= self.holdFrames:
+            return self._changeLevel(-1, fps)
+        if self.upCount >= self.holdFrames:
+            return self._changeLevel(1, fps)
+        return False
+
+    def _changeLevel(self, step, fps):
+        previous = self.level
+        if step < 0 and self.lastStep > 0:
+            # The level just stepped up into cannot be sustained: back off from retrying it exponentially
+            failures = self.upFailures.get(self.levelIndex, 0) + 1
+            self.upFailures[self.levelIndex] = failures
+            self.upBlockedUntil[self.levelIndex] = self.frames + self.retryFrames * 2 ** (failures - 1)
+            logger.info("AutoTuner: level %d not sustainable, not retried for %d frames", self.levelIndex,
+                        self.retryFrames * 2 ** (failures - 1))
+        self.lastStep = step
+        self.levelIndex += step
+        self.downCount = 0
+        self.upCount = 0
+        self.cooldown = self.cooldownFrames
+        # Frame times measured at the old level no longer apply
+        self.frameTime = None
+        logger.info("AutoTuner: %.1f fps (target %d, confidence %s), level %d -> %d: %s -> %s",
+                    fps, self.targetFps,
+                    f"{self.confidence:.2f}" if self.confidence is not None else "n/a",
+                    self.levelIndex - step, self.levelIndex, previous, self.level)
+        return True
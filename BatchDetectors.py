@@ -0,0 +1,179 @@
+import numpy as np
+from FullGrip import gripScores, DEFAULT_CLOSED_RATIOS, DEFAULT_OPEN_RATIOS
+from Sense import TOUCH_THRESHOLD, OPEN_THRESHOLD
+
+# Vectorized counterparts of the per-frame detectors. Every function takes a stack of landmark
+# frames of shape (N, 21, 2) or (N, 21, 3) and returns one result per frame, identical to calling
+# the per-frame API on each frame in turn.
+#
+# FingerCounter, GripDetector and WaveDetector work on pixel coordinates as returned by
+# HandDetector.findPosition; use toPixels to convert normalized MediaPipe landmarks first.
+# Sense works on normalized coordinates.
+
+FINGER_TIP_IDS = [8, 12, 16, 20]
+SENSE_TIPS = {"thumb": 4, "index": 8, "middle": 12, "ring": 16, "pinky": 20}
+SENSE_MCPS = {"index": 5, "middle": 9, "ring": 13, "pinky": 17}
+
+
+def _checkLandmarks(landmarks):
+    landmarks = np.asarray(landmarks, dtype=float)
+    if landmarks.ndim != 3 or landmarks.shape[1] != 21 or landmarks.shape[2] < 2:
+        raise ValueError(f"Expected landmarks of shape (N, 21, 2) or (N, 21, 3), got {landmarks.shape}.")
+    return landmarks
+
+
+def toPixels(landmarks, width, height):
+    """
+    Convert normalized landmarks to the integer pixel coordinates HandDetector.findPosition produces.
+    Args:
+        landmarks: Array of shape (N, 21, 2) or (N, 21, 3) with normalized coordinates.
+        width, height: Size of the frame the landmarks were detected on.
+    Returns:
+        np.ndarray: Array of shape (N, 21, 2) with truncated pixel coordinates.
+    """
+    landmarks = _checkLandmarks(landmarks)
+    return np.trunc(landmarks[..., :2] * np.array([width, height], dtype=float))
+
+
+def countFingers(points):
+    """
+    Batch version of FingerCounter.countFingers.
+    Args:
+        points: Array of shape (N, 21, 2+) with pixel coordinates.
+    Returns:
+        np.ndarray: Number of open fingers per frame.
+    """
+    points = _checkLandmarks(points)
+    thumb = points[:, 4, 0] < points[:, 3, 0]
+    tipIds = np.array(FINGER_TIP_IDS)
+    fingers = points[:, tipIds, 1] < points[:, tipIds - 2, 1]
+    return thumb.astype(int) + np.count_nonzero(fingers, axis=1)
+
+
+def analyzeGrip(points, closedRatios=None, openRatios=None, bendScore=0.5):
+    """
+    Batch version of GripDetector.analyzeGrip.
+    Args:
+        points: Array of shape (N, 21, 2+) with pixel coordinates.
+        closedRatios, openRatios, bendScore: See GripDetector.
+    Returns:
+        dict: "fingers" (N, 5) scores, "score" (N,) mean score, "bent" (N,) number of bent fingers,
+              "full" (N,) and "partial" (N,) grip flags.
+    """
+    points = _checkLandmarks(points)
+    closedRatios = closedRatios if closedRatios is not None else DEFAULT_CLOSED_RATIOS
+    openRatios = openRatios if openRatios is not None else DEFAULT_OPEN_RATIOS
+    fingers = gripScores(points[..., :2], closedRatios, openRatios)
+    bent = np.count_nonzero(fingers >= bendScore, axis=1)
+    return {
+        "fingers": fingers,
+        "score": fingers.mean(axis=1),
+        "bent": bent,
+        "full": bent == 5,
+        "partial": (bent >= 1) & (bent < 5),
+    }
+
+
+def extractHandMovements(landmarks):
+    """
+    Batch version of Sense.extract_hand_movements.
+    Args:
+        landmarks: Array of shape (N, 21, 2+) with normalized coordinates.
+    Returns:
+        dict: The same keys as Sense.extract_hand_movements, each mapped to an (N,) bool array.
+    """
+    landmarks = _checkLandmarks(landmarks)
+
+    def distance(a, b):
+        dx = landmarks[:, a, 0] - landmarks[:, b, 0]
+        dy = landmarks[:, a, 1] - landmarks[:, b, 1]
+        return np.sqrt(dx * dx + dy * dy)
+
+    movements = {}
+    for finger in ("index", "middle", "ring", "pinky"):
+        movements[f"thumb_to_{finger}"] = distance(SENSE_TIPS["thumb"], SENSE_TIPS[finger]) < TOUCH_THRESHOLD
+    for finger in ("index", "middle", "ring", "pinky"):
+        movements[finger] = distance(SENSE_TIPS[finger], SENSE_MCPS[finger]) > OPEN_THRESHOLD
+    return movements
+
+
+def detectDirectionChanges(xPositions, maxPositions=30, threshold=15, minPositions=5):
+    """
+    Batch version of WaveDetector.detectDirectionChanges over a sequence of tracked positions.
+    Result i is what the detector returns right after position i has been appended to its window
+    of the last maxPositions positions.
+    Args:
+        xPositions: 1D array of x positions of the index finger tip, one per frame with a hand.
+        maxPositions: Size of the sliding window (WaveDetector.max_positions).
+        threshold: Minimum movement between samples to count as a direction change.
+        minPositions: Minimum window size before a wave can be reported.
+    Returns:
+        np.ndarray: (M,) bool array, True where a wave is detected.
+    """
+    x = np.asarray(xPositions, dtype=float)
+    count = len(x)
+    detected = np.zeros(count, dtype=bool)
+    if count < max(minPositions, 3):
+        return detected
+
+    # Sample i (1..M-2) is a significant direction change if the movement into and out of it
+    # have opposite signs and the movement into it exceeds the threshold.
+    steps = x[:-1] - x[1:]
+    changes = (steps[:-1] * steps[1:] < 0) & (np.abs(steps[:-1]) > threshold)
+    # cumulative[k] = number of changes at samples 1..k
+    cumulative = np.concatenate(([0], np.cumsum(changes)))
+
+    end = np.arange(count)
+    start = np.maximum(0, end - maxPositions + 1)
+    full = end - start + 1 >= minPositions
+    # Changes at inner samples start+1 .. end-1 of each window
+    waves = np.zeros(count, dtype=int)
+    waves[full] = cumulative[end[full] - 1] - cumulative[start[full]]
+    detected[full] = waves[full] >= 2
+    return detected
+
+
+def detectWave(points, valid=None, maxPositions=30, threshold=15):
+    """
+    Batch version of WaveDetector.detectWave.
+    Args:
+        points: Array of shape (N, 21, 2+) with pixel coordinates.
+        valid: Optional (N,) bool array, False for frames where no hand was detected.
+               Those frames return False and do not enter the sliding window.
+        maxPositions, threshold: See WaveDetector.
+    Returns:
+        np.ndarray: (N,) bool array, True where a wave is detected.
+    """
+    points = _checkLandmarks(points)
+    valid = np.ones(len(points), dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+    detected = np.zeros(len(points), dtype=bool)
+    detected[valid] = detectDirectionChanges(points[valid, 8, 0], maxPositions, threshold)
+    return detected
+
+
+def analyzeRecording(landmarks, timestamps, width, height, valid=None):
+    """
+    Run every detector over a recording of normalized landmarks.
+    Args:
+        landmarks: Array of shape (N, 21, 3) with normalized MediaPipe landmarks.
+        timestamps: (N,) array of non-decreasing frame timestamps.
+        width, height: Size of the frames the landmarks were detected on.
+        valid: Optional (N,) bool array, False for frames where no hand was detected.
+    Returns:
+        dict: Per-frame result arrays keyed by detector, plus the timestamps they belong to.
+    """
+    landmarks = _checkLandmarks(landmarks)
+    timestamps = np.asarray(timestamps)
+    if timestamps.shape != (len(landmarks),):
+        raise ValueError(f"Expected {len(landmarks)} timestamps, got shape {timestamps.shape}.")
+    if np.any(np.diff(timestamps) < 0):
+        raise ValueError("Timestamps must be non-decreasing.")
+
+    points = toPixels(landmarks, width, height)
+    return {
+        "timestamps": timestamps,
+        "fingers": countFingers(points),
+        "grip": analyzeGrip(points),
+        "movements": extractHandMovements(landmarks),
+        "wave": detectWave(points, valid),
+    }
@@ -0,0 +1,410 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import deque
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Properties that change the negotiated mode; setting one re-reads what the device actually accepted
+_MODE_PROPERTIES = (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS, cv2.CAP_PROP_FOURCC,
+                    cv2.CAP_PROP_BUFFERSIZE)
+
+
+def _fourccString(value):
+    value = int(value)
+    return "".join(chr((value >> 8 * i) & 0xFF) for i in range(4)).strip("\x00")
+
+
+class FakeDevice:
+    """
+    A video file behaving like a camera, for running and testing the capture path without hardware.
+    It accepts any requested resolution and delivers frames at the file's frame rate (or the requested one,
+    if lower), looping at the end. failEvery simulates a device that drops out every n reads.
+    """
+
+    def __init__(self, path, realtime=True, loop=True, failEvery=None):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.failEvery = failEvery
+        self.cap = cv2.VideoCapture(path)
+        self.fileFps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.properties = {
+            cv2.CAP_PROP_FRAME_WIDTH: self.cap.get(cv2.CAP_PROP_FRAME_WIDTH),
+            cv2.CAP_PROP_FRAME_HEIGHT: self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT),
+            cv2.CAP_PROP_FPS: self.fileFps,
+            cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*"MJPG"),
+            cv2.CAP_PROP_BUFFERSIZE: 1,
+        }
+        self.reads = 0
+        self.nextFrameTime = 0
+        self.frame = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        if prop not in self.properties:
+            return False
+        if prop == cv2.CAP_PROP_FPS:
+            value = min(value, self.fileFps)
+        self.properties[prop] = value
+        return True
+
+    def get(self, prop):
+        return self.properties.get(prop, self.cap.get(prop))
+
+    def grab(self):
+        self.reads += 1
+        if self.failEvery and self.reads % self.failEvery == 0:
+            return False
+        if self.realtime:
+            delay = self.nextFrameTime - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.nextFrameTime = max(self.nextFrameTime, time.perf_counter()) + 1 / self.properties[cv2.CAP_PROP_FPS]
+        success, self.frame = self.cap.read()
+        if not success and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, self.frame = self.cap.read()
+        return success
+
+    def retrieve(self, image=None):
+        if self.frame is None:
+            return False, None
+        size = (int(self.properties[cv2.CAP_PROP_FRAME_WIDTH]), int(self.properties[cv2.CAP_PROP_FRAME_HEIGHT]))
+        if (self.frame.shape[1], self.frame.shape[0]) != size:
+            return True, cv2.resize(self.frame, size, dst=image)
+        if image is not None and image.shape == self.frame.shape:
+            image[...] = self.frame
+            return True, image
+        return True, self.frame
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self.cap.release()
+
+
+class Camera:
+    def __init__(self, source=0, width=640, height=480, fps=30, fourcc="MJPG", bufferSize=1, modes=None,
+                 probeFrames=10, reconnectAttempts=5, reconnectDelay=0.5, maxReconnectDelay=4.0, opener=None,
+                 manager=None):
+        """
+        A capture device negotiated for low latency, with transparent reconnects.
+        Reads and property calls mirror cv2.VideoCapture, so a Camera can be used wherever one was.
+        Args:
+            source: Camera index, or the path of a video file served through FakeDevice.
+            width, height, fps: Requested capture mode.
+            fourcc: Requested pixel format; MJPG lets most USB cameras deliver higher resolutions at full rate.
+            bufferSize: Driver-side frame queue length; 1 keeps the delivered frame current.
+            modes: Candidate (fourcc, width, height, fps) modes, fastest first; the first one the device accepts
+                is kept, see negotiate. Defaults to the requested mode, then YUYV instead of the requested
+                fourcc, then both at half the frame rate.
+            probeFrames: Frames read to measure the delivery rate of a candidate mode.
+            reconnectAttempts: Reopen attempts after a failed read before giving up.
+            reconnectDelay: Seconds between the first and second reopen attempt, doubled on every further attempt.
+                Nothing sleeps: reads until the next attempt is due fail at once, so the caller's loop (or Tk
+                timer) keeps running and simply reads again later.
+            maxReconnectDelay: Upper bound of the delay between attempts in seconds.
+            opener: Callable creating the capture from source, e.g. a FakeDevice with failEvery set.
+                By default file paths open a FakeDevice and indexes a cv2.VideoCapture.
+            manager: Owning CameraManager, if the handle is shared.
+        """
+        self.source = source
+        self.requested = {"width": width, "height": height, "fps": fps, "fourcc": fourcc, "bufferSize": bufferSize}
+        if modes is None:
+            fourccs = [fourcc, "YUYV"] if fourcc and fourcc != "YUYV" else [fourcc]
+            modes = [(code, width, height, rate) for rate in (fps, fps / 2) for code in fourccs]
+        self.modes = modes
+        self.probeFrames = probeFrames
+        self.mode = None  # Negotiated (fourcc, width, height, fps), reapplied on reconnects
+        self.probedRate = 0.0  # Delivery rate measured while negotiating
+        self.reconnectAttempts = reconnectAttempts
+        self.reconnectDelay = reconnectDelay
+        self.maxReconnectDelay = maxReconnectDelay
+        self.attempts = 0  # Failed reopen attempts since the device was lost
+        self.retryAt = None  # When the next reopen attempt is due while reconnecting
+        self.opener = opener
+        self.manager = manager
+        self.settings = {}  # What the device actually accepted, see negotiate
+        self.readTimes = deque(maxlen=60)
+        self.frames = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.cap = None
+        self.open()
+
+    def _createCapture(self):
+        if self.opener is not None:
+            return self.opener(self.source)
+        if isinstance(self.source, str) and not self.source.isdigit():
+            return FakeDevice(self.source)
+        return cv2.VideoCapture(int(self.source))
+
+    def open(self):
+        self.cap = self._createCapture()
+        if self.cap.isOpened():
+            if self.mode is None:
+                self.negotiate()
+            else:
+                self._applyMode(self.mode)
+                self._readSettings()
+        return self.cap.isOpened()
+
+    def negotiate(self):
+        """
+        Try the candidate modes in order and keep the first one the device accepts: it reports back the
+        requested fourcc, resolution and frame rate, and delivers at least 80% of that rate when read.
+        If none is accepted, the candidate that delivered the most frames per second is used.
+        """
+        best = None
+        for mode in self.modes:
+            self._applyMode(mode)
+            self._readSettings()
+            rate = self._measureDelivery()
+            if self._accepts(mode, rate):
+                break
+            logger.info("Camera %s: %s %dx%d at %.0f fps not accepted (got %s, delivering %.1f fps)", self.source,
+                        *mode, self.describe(), rate)
+            if best is None or rate > best[1]:
+                best = (mode, rate)
+        else:
+            mode, rate = best
+            self._applyMode(mode)
+            self._readSettings()
+        self.mode = mode
+        self.probedRate = rate
+        logger.info("Camera %s: %s, measured %.1f fps", self.source, self.describe(), rate)
+
+    def _applyMode(self, mode):
+        # The pixel format is set first: V4L2 drivers pick the available resolutions and rates from it
+        fourcc, width, height, fps = mode
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self.requested["bufferSize"])
+
+    def _accepts(self, mode, rate):
+        fourcc, width, height, fps = mode
+        settings = self.settings
+        if (settings["width"], settings["height"]) != (width, height):
+            return False
+        if fourcc and settings["fourcc"] != fourcc:
+            return False
+        # Some backends report 0 fps; the measured rate decides then
+        if settings["fps"] and settings["fps"] < fps * 0.9:
+            return False
+        return rate >= fps * 0.8
+
+    def _measureDelivery(self):
+        """Read probeFrames frames and return their delivery rate; the first read, often slow, is not timed."""
+        if not self.cap.read()[0]:
+            return 0.0
+        sTime = time.perf_counter()
+        for _ in range(self.probeFrames):
+            if not self.cap.read()[0]:
+                return 0.0
+        return self.probeFrames / max(time.perf_counter() - sTime, 1e-6)
+
+    def _readSettings(self):
+        self.settings = {
+            "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": _fourccString(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            "bufferSize": int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+
+    def describe(self):
+        settings = self.settings
+        return (f"{settings['width']}x{settings['height']} {settings['fourcc'] or '?'} at {settings['fps']:.0f} fps, "
+                f"buffer {settings['bufferSize']}")
+
+    @property
+    def deliveryRate(self):
+        """Frames per second actually delivered over the last reads."""
+        if len(self.readTimes) < 2:
+            return 0.0
+        return (len(self.readTimes) - 1) / max(self.readTimes[-1] - self.readTimes[0], 1e-6)
+
+    def report(self):
+        return (f"Camera {self.source}: {self.describe()}, delivering {self.deliveryRate:.1f} fps, "
+                f"{self.frames} frames, {self.failures} failed reads, {self.reconnects} reconnects")
+
+    def isOpened(self):
+        """True while the device is open or still being reconnected."""
+        return self.cap is not None and (self.cap.isOpened() or self.retryAt is not None)
+
+    @property
+    def reconnecting(self):
+        return self.retryAt is not None
+
+    def set(self, prop, value):
+        result = self.cap.set(prop, value)
+        if prop in _MODE_PROPERTIES:
+            self._readSettings()
+        return result
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def reconnect(self):
+        """
+        Make one attempt to reopen the device with the negotiated mode, without waiting.
+        If it fails, the next attempt is scheduled with exponential backoff and made by a later read or grab.
+        Returns:
+            bool: True if the device is open again.
+        """
+        if self.attempts == 0:
+            # Keep a resolution changed after opening, e.g. by the AutoTuner
+            if self.settings and self.mode is not None:
+                self.mode = (self.mode[0], self.settings["width"], self.settings["height"], self.mode[3])
+        self.attempts += 1
+        logger.warning("Camera %s: read failed, reconnecting (attempt %d)", self.source, self.attempts)
+        self.cap.release()
+        if self.open():
+            self.reconnects += 1
+            self.attempts = 0
+            self.retryAt = None
+            return True
+        if self.attempts >= self.reconnectAttempts:
+            logger.error("Camera %s: giving up after %d reconnect attempts", self.source, self.attempts)
+            self.retryAt = None
+        else:
+            delay = min(self.reconnectDelay * 2 ** (self.attempts - 1), self.maxReconnectDelay)
+            self.retryAt = time.monotonic() + delay
+        return False
+
+    def _ready(self):
+        # While reconnecting, fail at once until the next attempt is due; after giving up, stay closed
+        if self.retryAt is None:
+            return self.attempts < self.reconnectAttempts
+        return time.monotonic() >= self.retryAt and self.reconnect()
+
+    def read(self, image=None):
+        if not self._ready():
+            return False, None
+        success, frame = self.cap.read(image) if image is not None else self.cap.read()
+        if not success:
+            self.failures += 1
+            if self.reconnect():
+                success, frame = self.cap.read(image) if image is not None else self.cap.read()
+        if success:
+            self.frames += 1
+            self.readTimes.append(time.perf_counter())
+        return success, frame
+
+    def grab(self):
+        if not self._ready():
+            return False
+        success = self.cap.grab()
+        if not success and self.reconnect():
+            success = self.cap.grab()
+        return success
+
+    def release(self):
+        """Release this handle; the device is closed once every user of a shared handle released it."""
+        if self.manager is not None:
+            self.manager.release(self)
+        else:
+            self.close()
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class CameraManager:
+    def __init__(self):
+        """
+        Hands out one shared Camera per source, so the session, the exercises and their detectors read from
+        the same negotiated device instead of each opening it with their own settings.
+        """
+        self.cameras = {}
+        self.users = {}
+        self.lock = threading.Lock()
+
+    def open(self, source=None, **settings):
+        """
+        Return the shared Camera of a source, opening it on first use.
+        Args:
+            source: Camera index or video file; None uses $SELINSEV_CAMERA, defaulting to camera 0.
+            **settings: Camera arguments, only used when the device is opened. With $SELINSEV_CAPTURE=shared
+                and no opener given, the device is read by a separate process through shared memory
+                (see SharedFrameRing.SharedCapture).
+        Returns:
+            Camera: The shared handle; call release() when done with it.
+        """
+        if source is None:
+            source = os.environ.get("SELINSEV_CAMERA", 0)
+        if os.environ.get("SELINSEV_CAPTURE") == "shared" and settings.get("opener") is None:
+            # Imported here: SharedFrameRing uses HandTrackingModule, which imports this module
+            from SharedFrameRing import SharedCapture
+            settings["opener"] = SharedCapture
+        key = str(source)
+        with self.lock:
+            camera = self.cameras.get(key)
+            if camera is None or not camera.isOpened():
+                camera = Camera(source, manager=self, **settings)
+                self.cameras[key] = camera
+                self.users[key] = 0
+            self.users[key] += 1
+            return camera
+
+    def release(self, camera):
+        key = str(camera.source)
+        with self.lock:
+            if self.cameras.get(key) is not camera:
+                camera.close()
+                return
+            self.users[key] -= 1
+            if self.users[key] <= 0:
+                logger.info(camera.report())
+                camera.close()
+                del self.cameras[key]
+                del self.users[key]
+
+
+_manager = CameraManager()
+
+
+def openCamera(source=None, **settings):
+    """Open the process-wide shared handle of a camera, see CameraManager.open."""
+    return _manager.open(source, **settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Negotiate a camera mode and measure its delivery rate.")
+    parser.add_argument("source", nargs="?", default=None, help="Camera index or video file (fake device)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--fourcc", default="MJPG")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    camera = openCamera(args.source, width=args.width, height=args.height, fps=args.fps, fourcc=args.fourcc)
+    if not camera.isOpened():
+        print("Failed to open camera.")
+        return
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end:
+        success, _ = camera.read()
+        if not success:
+            break
+    print(camera.report())
+    camera.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import HandTrackingModule as HTM
+import BatchDetectors
+
+# Hand detector of the current worker process, created once by _initWorker
+_detector = None
+
+
+def _initWorker(modelComplexity):
+    global _detector
+    # Static image mode makes every frame's landmarks independent of the frames before it,
+    # so a segment gives the same landmarks whether it is processed alone or as part of a serial run.
+    _detector = HTM.HandDetector(mode=True, maxHands=1, modelComplexity=modelComplexity)
+
+
+def _openAt(path, frameIndex):
+    cap = cv2.VideoCapture(path)
+    if frameIndex > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frameIndex)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != frameIndex:
+            # The backend could not seek exactly; skip frames without decoding them instead
+            cap.release()
+            cap = cv2.VideoCapture(path)
+            for _ in range(frameIndex):
+                cap.grab()
+    return cap
+
+
+def processSegment(path, start, end, overlap, maxPositions=30, threshold=15):
+    """
+    Decode and analyze the frames [start, end) of a video, warming up the stateful detectors
+    on up to overlap frames before start.
+    Args:
+        path: Path to the video file.
+        start, end: Frame range of the segment. end may be None to read to the end of the file.
+        overlap: Number of frames before start that are processed to rebuild the wave window.
+        maxPositions, threshold: WaveDetector settings.
+    Returns:
+        dict: Per-frame result arrays for the segment, and "resolved", which is False if the overlap
+              held too few hand detections to rebuild the wave window exactly.
+    """
+    if _detector is None:
+        _initWorker(1)
+    warmStart = max(0, start - overlap)
+    cap = _openAt(path, warmStart)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+
+    landmarks = []
+    valid = []
+    width = height = 0
+    index = warmStart
+    while end is None or index < end:
+        success, frame = cap.read()
+        if not success:
+            break
+        height, width = frame.shape[:2]
+        # Frame position as timestamp, so a replay backend returns the same frame in every segment
+        _detector.findHands(frame, draw=False, timestamp=index * 1000 / fps)
+        hands = _detector.results.multi_hand_landmarks
+        if hands:
+            landmarks.append([(lm.x, lm.y, lm.z) for lm in hands[0].landmark])
+            valid.append(True)
+        else:
+            landmarks.append([(0.0, 0.0, 0.0)] * 21)
+            valid.append(False)
+        index += 1
+    cap.release()
+
+    landmarks = np.array(landmarks, dtype=float).reshape(-1, 21, 3)
+    valid = np.array(valid, dtype=bool)
+    points = BatchDetectors.toPixels(landmarks, max(width, 1), max(height, 1))
+    wave = BatchDetectors.detectWave(points, valid, maxPositions, threshold)
+
+    # The wave window at the first frame of the segment needs the previous maxPositions - 1 detections
+    warm = start - warmStart
+    resolved = warmStart == 0 or np.count_nonzero(valid[:warm]) >= maxPositions - 1
+
+    core = slice(warm, None)
+    landmarks, valid, points, wave = landmarks[core], valid[core], points[core], wave[core]
+    grip = BatchDetectors.analyzeGrip(points)
+    movements = BatchDetectors.extractHandMovements(landmarks)
+    return {
+        "start": start,
+        "resolved": resolved,
+        "width": width,
+        "height": height,
+        "timestamps": np.arange(start, start + len(valid)) / fps,
+        "landmarks": landmarks,
+        "valid": valid,
+        "fingers": np.where(valid, BatchDetectors.countFingers(points), 0),
+        "gripScore": np.where(valid, grip["score"], 0.0),
+        "fullGrip": grip["full"] & valid,
+        "partialGrip": grip["partial"] & valid,
+        "movements": {name: flags & valid for name, flags in movements.items()},
+        "wave": wave,
+    }
+
+
+def _stitch(segments, maxPositions, threshold):
+    segments = sorted(segments, key=lambda segment: segment["start"])
+    result = {"width": segments[0]["width"], "height": segments[0]["height"]}
+    for key in ("timestamps", "landmarks", "valid", "fingers", "gripScore", "fullGrip", "partialGrip", "wave"):
+        result[key] = np.concatenate([segment[key] for segment in segments])
+    result["movements"] = {name: np.concatenate([segment["movements"][name] for segment in segments])
+                           for name in segments[0]["movements"]}
+
+    if not all(segment["resolved"] for segment in segments):
+        # A seam had too few detections in its overlap; recompute the wave window over the whole
+        # recording, which only needs the stitched landmarks
+        points = BatchDetectors.toPixels(result["landmarks"], result["width"], result["height"])
+        result["wave"] = BatchDetectors.detectWave(points, result["valid"], maxPositions, threshold)
+
+    # Repetition counters as the frame loop would have them after each frame
+    result["waveCount"] = np.cumsum(result["wave"])
+    result["gripCount"] = np.cumsum(result["fullGrip"])
+    return result
+
+
+def analyzeSerial(path, maxPositions=30, threshold=15, modelComplexity=1):
+    """Analyze a whole video in this process, frame by frame."""
+    _initWorker(modelComplexity)
+    segment = processSegment(path, 0, None, 0, maxPositions, threshold)
+    return _stitch([segment], maxPositions, threshold)
+
+
+def analyzeParallel(path, workers=None, segments=None, overlap=None, maxPositions=30, threshold=15,
+                    modelComplexity=1):
+    """
+    Analyze one video by splitting it into overlapping segments processed in worker processes.
+    Args:
+        path: Path to the video file.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        segments: Number of segments. Defaults to the number of workers.
+        overlap: Frames processed before each segment to rebuild stateful windows.
+                 Defaults to twice the wave window.
+        maxPositions, threshold: WaveDetector settings.
+        modelComplexity: MediaPipe model complexity.
+    Returns:
+        dict: Per-frame result arrays, identical to analyzeSerial.
+    """
+    workers = workers or os.cpu_count() or 1
+    segments = segments or workers
+    overlap = overlap if overlap is not None else 2 * maxPositions
+
+    cap = cv2.VideoCapture(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total <= 0 or segments == 1:
+        return analyzeSerial(path, maxPositions, threshold, modelComplexity)
+
+    bounds = np.linspace(0, total, segments + 1).astype(int)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                             initargs=(modelComplexity,)) as pool:
+        futures = []
+        for i in range(segments):
+            # The frame count can be approximate, so the last segment reads to the end of the file
+            end = int(bounds[i + 1]) if i < segments - 1 else None
+            futures.append(pool.submit(processSegment, path, int(bounds[i]), end, overlap,
+                                       maxPositions, threshold))
+        results = [future.result() for future in futures]
+    return _stitch(results, maxPositions, threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a long session recording in parallel.")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--verify", action="store_true", help="Also run serially and compare the results")
+    args = parser.parse_args()
+
+    sTime = time.time()
+    result = analyzeParallel(args.video, workers=args.workers)
+    parallelTime = time.time() - sTime
+    frames = len(result["valid"])
+    print(f"Parallel: {frames} frames in {parallelTime:.1f} s ({frames / parallelTime:.1f} fps), "
+          f"{result['waveCount'][-1] if frames else 0} waves, {result['gripCount'][-1] if frames else 0} full grips")
+
+    if args.verify:
+        sTime = time.time()
+        serial = analyzeSerial(args.video)
+        serialTime = time.time() - sTime
+        same = all(np.array_equal(result[key], serial[key])
+                   for key in ("valid", "landmarks", "fingers", "gripScore", "wave", "waveCount"))
+        print(f"Serial: {serialTime:.1f} s, speedup {serialTime / parallelTime:.2f}x, identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
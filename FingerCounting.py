@@ -2,10 +2,13 @@ import cv2
 import time
 import os
 import HandTrackingModule as HTM
+from CameraManager import openCamera
+from Profiler import FrameProfiler
+from PresenceMonitor import PresenceMonitor
 
 class FingerCounter:
 
-    def __init__(self, wCam=640, hCam=480, detectionCon=0.8, folderPath="FingerImages"):
+    def __init__(self, wCam=640, hCam=480, detectionCon=0.8, folderPath="FingerImages", cap=None, modelComplexity=1):
         """
         Initialize the FingerCounter class.
         Args:
@@ -13,24 +16,22 @@ class FingerCounter:
             hCam: Height of the camera feed.
             detectionCon: Confidence level for hand detection.
             folderPath: Path to the folder containing finger images.
+            cap: Optional already opened capture to share. If None, run() opens the shared camera.
+            modelComplexity: Landmark model complexity of the hand detector (0 = lite, 1 = full).
         """
         self.wCam = wCam
         self.hCam = hCam
         self.detectionCon = detectionCon
-        self.folderPath = r'E:\Week3_code_example\coach\FingerImages'  # Absolute path
+        self.folderPath = folderPath
         self.tipIds = [8, 12, 16, 20]
         self.pTime = 0
-
-        # Initialize camera
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(3, self.wCam)  # Set width
-        self.cap.set(4, self.hCam)  # Set height
+        self.cap = cap
 
         # Load images for overlays
         self.overlayList = self.loadImages()
 
         # Initialize hand detector
-        self.detector = HTM.HandDetector(detectionCon=self.detectionCon)
+        self.detector = HTM.HandDetector(detectionCon=self.detectionCon, modelComplexity=modelComplexity)
 
     def loadImages(self):
         """
@@ -38,15 +39,15 @@ class FingerCounter:
         Returns:
             List of overlay images.
         """
-        myList = os.listdir(self.folderPath)  # Check if this path is valid
+        myList = sorted(os.listdir(self.folderPath))  # Check if this path is valid
         overlayList = []
         for imPath in myList:
             image = cv2.imread(f'{self.folderPath}/{imPath}')
             overlayList.append(image)
         return overlayList
 
-    def lmlist(self, img):
-        img = self.detector.findHands(img)
+    def lmlist(self, img, timestamp=None):
+        img = self.detector.findHands(img, timestamp=timestamp)
         lmList = self.detector.findPosition(img, draw=False)
         return lmList
 
@@ -89,15 +90,23 @@ class FingerCounter:
         """
         Main loop to run the finger counter. Captures video feed, processes frames, and displays results.
         """
+        if self.cap is None:
+            # Initialize camera
+            self.cap = openCamera(width=self.wCam, height=self.hCam)
+
+        profiler = FrameProfiler.fromEnv()
+        presence = PresenceMonitor()
         while True:
+            presence.waitForNextFrame(self.cap)
+            profiler.frameStart()
             success, frame = self.cap.read()
             if not success:
                 print("Failed to read from camera.")
                 break
 
             # Detect hand landmarks
-            frame = self.detector.findHands(frame)
-            lmList = self.detector.findPosition(frame, draw=False)
+            with profiler.stage("inference"):
+                lmList = presence.detectHands(self.detector, frame, self.cap.get(cv2.CAP_PROP_POS_MSEC))
 
             if len(lmList) > 0:
                 # Count the number of open fingers
@@ -118,9 +127,13 @@ class FingerCounter:
             # Display the frame
             cv2.imshow('frame', frame)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            key = cv2.waitKey(1) & 0xFF
+            profiler.frameEnd(key)
+            if key == ord('q'):
                 break
 
+        profiler.close()
+        print(f"Presence duty cycling: {presence.summary()}")
         self.cap.release()
         cv2.destroyAllWindows()
 
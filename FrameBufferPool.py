@@ -0,0 +1,50 @@
+import cv2
+
+
+class FrameBufferPool:
+    def __init__(self):
+        """
+        Named, fixed-shape frame buffers reused from frame to frame.
+        OpenCV writes into a buffer passed as image/dst when its shape and type fit, and only allocates
+        a new one otherwise, e.g. after a resolution change. The counters show how often that happened.
+        A buffer is overwritten by the next call with the same name, so frames that must outlive the
+        current loop iteration have to be copied.
+        """
+        self.buffers = {}
+        self.allocations = 0  # Calls that had to allocate a new buffer
+        self.reuses = 0  # Calls that wrote into an existing buffer
+
+    def _track(self, name, buffer, result):
+        if result is buffer:
+            self.reuses += 1
+        else:
+            self.buffers[name] = result
+            self.allocations += 1
+        return result
+
+    def read(self, cap, name="frame"):
+        """Read a frame from a cv2.VideoCapture into the named buffer. Returns (success, frame)."""
+        buffer = self.buffers.get(name)
+        success, frame = cap.read(buffer) if buffer is not None else cap.read()
+        if not success:
+            return False, None
+        return True, self._track(name, buffer, frame)
+
+    def cvtColor(self, src, code, name):
+        """cv2.cvtColor into the named buffer."""
+        buffer = self.buffers.get(name)
+        return self._track(name, buffer, cv2.cvtColor(src, code, dst=buffer))
+
+    def resize(self, src, size, name, interpolation=cv2.INTER_AREA):
+        """cv2.resize into the named buffer."""
+        buffer = self.buffers.get(name)
+        return self._track(name, buffer, cv2.resize(src, size, dst=buffer, interpolation=interpolation))
+
+    def absdiff(self, src1, src2, name):
+        """cv2.absdiff into the named buffer."""
+        buffer = self.buffers.get(name)
+        return self._track(name, buffer, cv2.absdiff(src1, src2, dst=buffer))
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
@@ -1,36 +1,88 @@
 import cv2
 import time
-import math
+import numpy as np
 import HandTrackingModule as HTM
+from CameraManager import openCamera
+from Profiler import FrameProfiler
+from PresenceMonitor import PresenceMonitor
+
+# Fingertip landmarks (thumb, index, middle, ring, pinky)
+TIP_IDS = [4, 8, 12, 16, 20]
+# Reference joint each fingertip is measured against. The thumb tip barely moves relative to its own MCP
+# when it closes, so it is measured against the pinky MCP (landmark 17): the thumb opposes towards it,
+# and unlike the index PIP it stays put whatever the other fingers do.
+BASE_IDS = [17, 5, 9, 13, 17]
+# Palm size reference: wrist (0) to middle finger MCP (9)
+PALM_IDS = (0, 9)
+# Default tip-to-base distances, relative to palm size, of fully bent and fully extended fingers.
+# The thumb's are measured to the pinky MCP and so have their own range.
+DEFAULT_CLOSED_RATIOS = [0.55, 0.35, 0.35, 0.35, 0.35]
+DEFAULT_OPEN_RATIOS = [1.2, 0.95, 1.0, 0.95, 0.8]
+
+
+def gripScores(points, closedRatios, openRatios):
+    """
+    Compute per-finger flexion scores from landmark coordinates in one vectorized pass.
+    Args:
+        points: Array of shape (..., 21, 2) with landmark (x, y) coordinates in any unit.
+        closedRatios: Per-finger tip-to-base distance, relative to palm size, of a fully bent finger.
+        openRatios: Per-finger tip-to-base distance, relative to palm size, of a fully extended finger.
+    Returns:
+        np.ndarray: Array of shape (..., 5) with scores from 0.0 (extended) to 1.0 (fully bent).
+    """
+    points = np.asarray(points, dtype=float)
+    distances = np.linalg.norm(points[..., TIP_IDS, :] - points[..., BASE_IDS, :], axis=-1)
+    palm = np.linalg.norm(points[..., PALM_IDS[0], :] - points[..., PALM_IDS[1], :], axis=-1)
+    # Guard against degenerate detections where the wrist and middle MCP coincide
+    ratios = distances / np.maximum(palm, 1e-6)[..., np.newaxis]
+    openRatios = np.asarray(openRatios, dtype=float)
+    closedRatios = np.asarray(closedRatios, dtype=float)
+    return np.clip((openRatios - ratios) / (openRatios - closedRatios), 0.0, 1.0)
+
 
 class GripDetector:
-    def __init__(self, thresholds=None):
+    def __init__(self, closedRatios=None, openRatios=None, bendScore=0.5, modelComplexity=1):
         """
-        Initialize the GripDetector class with optional thresholds for grip detection.
+        Initialize the GripDetector class with optional, scale-normalized grip thresholds.
+        Distances are expressed relative to palm size, so they do not depend on capture
+        resolution or how far the hand is from the camera.
         Args:
-            thresholds: List of distance thresholds for each finger to detect full grip.
+            closedRatios: Per-finger tip-to-base distance / palm size of a fully bent finger.
+            openRatios: Per-finger tip-to-base distance / palm size of a fully extended finger.
+            bendScore: Minimum per-finger grip score for a finger to count as bent.
+            modelComplexity: Landmark model complexity of the hand detector (0 = lite, 1 = full).
         """
         self.pTime = 0  # Previous time for FPS calculation
-        self.thresholds = thresholds if thresholds is not None else [30, 30, 40, 40, 40]  # Default thresholds
-        self.detector = HTM.HandDetector()  # Initialize the hand detector
+        self.closedRatios = closedRatios if closedRatios is not None else DEFAULT_CLOSED_RATIOS
+        self.openRatios = openRatios if openRatios is not None else DEFAULT_OPEN_RATIOS
+        self.bendScore = bendScore
+        self.detector = HTM.HandDetector(modelComplexity=modelComplexity)  # Initialize the hand detector
 
-    def calculateDistance(self, p1, p2):
+    def analyzeGrip(self, lmList):
         """
-        Calculate the Euclidean distance between two points p1 and p2.
+        Computes continuous grip scores for the hand.
         Args:
-            p1, p2: Tuples or lists representing points (x, y).
+            lmList: List of landmark positions for the hand, in the form [id, x, y].
         Returns:
-            float: Euclidean distance between p1 and p2.
+            dict: "fingers" (per-finger scores, 0.0 open to 1.0 fully bent, ordered thumb to pinky),
+                  "score" (mean of the finger scores), "bent" (number of bent fingers) and
+                  "state" ("full", "partial" or "open"), or None if the landmark list is incomplete.
         """
-        # Ensure p1 and p2 are tuples or lists with at least two elements (x, y)
-        if len(p1) < 2 or len(p2) < 2:
-            raise ValueError("Both points must have at least two coordinates (x, y).")
+        if len(lmList) < 21:
+            return None
+
+        points = np.array([lm[1:3] for lm in lmList], dtype=float)
+        fingers = gripScores(points, self.closedRatios, self.openRatios)
+        bent = int(np.count_nonzero(fingers >= self.bendScore))
 
-        # Ensure points are converted to floats if they are not already
-        p1 = [float(coord) for coord in p1]
-        p2 = [float(coord) for coord in p2]
+        if bent == 5:
+            state = "full"
+        elif bent >= 1:
+            state = "partial"
+        else:
+            state = "open"
 
-        return math.sqrt((p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2)
+        return {"fingers": fingers, "score": float(fingers.mean()), "bent": bent, "state": state}
 
     def detectFullGrip(self, lmList):
         """
@@ -40,35 +92,11 @@ class GripDetector:
         Returns:
             bool: True if a full grip is detected, otherwise False.
         """
-        if len(lmList) == 0:
-            return False
-
-        # Fingertip landmarks (4, 8, 12, 16, 20)
-        fingertips = [lmList[4], lmList[8], lmList[12], lmList[16], lmList[20]]
-
-        # Corresponding base joint landmarks (2, 5, 9, 13, 17)
-        base_joints = [lmList[6], lmList[5], lmList[9], lmList[13], lmList[17]]  # Ensure thumb is at index 2
-
-        # Check the distance between each fingertip and its corresponding base joint
-        for i in range(5):
-            # Ensure we're accessing valid 2D coordinates (x, y)
-            if len(fingertips[i]) < 3 or len(base_joints[i]) < 3:
-                return False  # Skip if we don't have the necessary data
-
-            fingertip_x, fingertip_y = fingertips[i][1], fingertips[i][2]  # assuming lmList[i] is in form (id, x, y)
-            base_joint_x, base_joint_y = base_joints[i][1], base_joints[i][2]
-
-            # Calculate the distance between the fingertip and the base joint
-            distance = self.calculateDistance((fingertip_x, fingertip_y), (base_joint_x, base_joint_y))
+        grip = self.analyzeGrip(lmList)
+        return grip is not None and grip["state"] == "full"
 
-            # Check if the distance exceeds the threshold for a closed fist
-            if distance > self.thresholds[i]:
-                return False  # If any finger isn't bent enough, it's not a full grip
-
-        # If all distances are below the thresholds, it's a full grip
-        return True
-    def lmlist(self, img):
-        img = self.detector.findHands(img)
+    def lmlist(self, img, timestamp=None):
+        img = self.detector.findHands(img, timestamp=timestamp)
         lmList = self.detector.findPosition(img, draw=False)
         return lmList
 
@@ -80,58 +108,45 @@ class GripDetector:
         Returns:
             bool: True if a partial grip is detected, otherwise False.
         """
-        if len(lmList) == 0:
-            return False
-
-        # Fingertip landmarks (4, 8, 12, 16, 20)
-        fingertips = [lmList[4], lmList[8], lmList[12], lmList[16], lmList[20]]
-
-        # Corresponding base joint landmarks (2, 5, 9, 13, 17)
-        base_joints = [lmList[2], lmList[5], lmList[9], lmList[13], lmList[17]]  # Ensure thumb is at index 2
-
-        bent_fingers = 0
-        straight_fingers = 0
-
-        # Check the distance between each fingertip and its corresponding base joint
-        for i in range(5):
-            distance = self.calculateDistance(fingertips[i][1:], base_joints[i][1:])
-            if distance < self.thresholds[i]:
-                bent_fingers += 1  # Finger is bent
-            else:
-                straight_fingers += 1  # Finger is straight
-
-        # If some fingers are bent but not all, it's a partial grip
-        return 1 <= bent_fingers < 5
+        grip = self.analyzeGrip(lmList)
+        return grip is not None and grip["state"] == "partial"
 
     def run(self):
         """
         Main loop for the grip detection.
         Captures video feed, detects hand landmarks, and identifies grip status.
         """
-        cap = cv2.VideoCapture(0)
+        cap = openCamera()
 
+        profiler = FrameProfiler.fromEnv()
+        presence = PresenceMonitor()
         while True:
+            presence.waitForNextFrame(cap)
+            profiler.frameStart()
             success, img = cap.read()
             if not success:
                 print("Failed to read from camera.")
                 break
 
-            img = self.detector.findHands(img)
-            lmList = self.detector.findPosition(img, draw=False)
+            with profiler.stage("inference"):
+                lmList = presence.detectHands(self.detector, img, cap.get(cv2.CAP_PROP_POS_MSEC))
 
             if not lmList:  # Check if lmList is empty
                 cv2.putText(img, "No Hand Detected", (50, 150), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 0, 255), 1)
             else:
+                grip = self.analyzeGrip(lmList)
                 # Detect full grip
-                if self.detectFullGrip(lmList):
+                if grip["state"] == "full":
                     cv2.putText(img, "Full Grip Detected!", (50, 150), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 255, 0), 1)
                     print("Full grip detected!")
                 # Detect partial grip
-                elif self.detectPartialGrip(lmList):
+                elif grip["state"] == "partial":
                     cv2.putText(img, "Partial Grip Detected!", (50, 150), cv2.FONT_HERSHEY_COMPLEX, 1, (255, 255, 0), 1)
                     print("Partial grip detected!")
                 else:
                     cv2.putText(img, "Open Hand", (50, 150), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 0, 255), 1)
+                cv2.putText(img, f"Grip: {int(grip['score'] * 100)}%", (50, 190), cv2.FONT_HERSHEY_COMPLEX, 1,
+                            (255, 0, 255), 1)
 
             # FPS Calculation
             cTime = time.time()
@@ -141,9 +156,13 @@ class GripDetector:
 
             cv2.imshow("Image", img)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            key = cv2.waitKey(1) & 0xFF
+            profiler.frameEnd(key)
+            if key == ord('q'):
                 break
 
+        profiler.close()
+        print(f"Presence duty cycling: {presence.summary()}")
         cap.release()
         cv2.destroyAllWindows()
 
@@ -1,27 +1,48 @@
 import cv2
-import mediapipe as mp
 import time
+from FrameBufferPool import FrameBufferPool
+from LandmarkBackends import createBackend, drawLandmarks
+from CameraManager import openCamera
+from Profiler import FrameProfiler
 
 class HandDetector():
-    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5):
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5, modelComplexity=1,
+                 motionGate=None, backend=None):
         self.mode = mode
         self.maxHands = maxHands
         self.detectionCon = detectionCon
         self.trackCon = trackCon
-        self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(self.mode, self.maxHands,
-                                        min_detection_confidence=self.detectionCon,
-                                        min_tracking_confidence=self.trackCon)
-        self.mpDraw = mp.solutions.drawing_utils
+        self.modelComplexity = modelComplexity
+        # Landmark source; by default the one selected by $SELINSEV_BACKEND (MediaPipe unless set)
+        self.hands = backend if backend is not None else self.createHands()
+        self.motionGate = motionGate  # Optional MotionGate; gated frames reuse the previous results
+        self.bufferPool = FrameBufferPool()  # Reused RGB conversion buffer
+        self.results = None
 
-    def findHands(self, img, draw=True):
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
+    def createHands(self):
+        return createBackend(maxHands=self.maxHands, modelComplexity=self.modelComplexity,
+                             detectionCon=self.detectionCon, trackCon=self.trackCon, staticMode=self.mode)
+
+    def setModelComplexity(self, modelComplexity):
+        """Switch the landmark model complexity (0 = lite, 1 = full), for backends that have variants."""
+        if modelComplexity == self.modelComplexity:
+            return
+        self.modelComplexity = modelComplexity
+        self.hands.setModelComplexity(modelComplexity)
+
+    def findHands(self, img, draw=True, timestamp=None):
+        """
+        Detect hands in a BGR frame, drawing them on it when draw is set.
+        timestamp is the frame's capture position in ms, which replaying backends use to stay in sync.
+        """
+        infer = self.motionGate is None or self.motionGate.shouldInfer(img)
+        if infer or self.results is None:
+            imgRGB = self.bufferPool.cvtColor(img, cv2.COLOR_BGR2RGB, "rgb")
+            self.results = self.hands.process(imgRGB, timestamp)
         if self.results.multi_hand_landmarks:
             for handLms in self.results.multi_hand_landmarks:
                 if draw:
-                    self.mpDraw.draw_landmarks(img, handLms,
-                                               self.mpHands.HAND_CONNECTIONS)
+                    drawLandmarks(img, handLms)
         return img
 
     def findPosition(self, img, handNo=0, draw=True):
@@ -39,16 +60,19 @@ class HandDetector():
 def main():
     pTime = 0
     cTime = 0
-    cap = cv2.VideoCapture(0)  # Make sure your camera index is correct
+    cap = openCamera()  # $SELINSEV_CAMERA selects another camera index or a video file
     detector = HandDetector()
 
+    profiler = FrameProfiler.fromEnv()
     while True:
+        profiler.frameStart()
         success, img = cap.read()
         if not success:
             print("Failed to read from camera.")
             break
 
-        img = detector.findHands(img)
+        with profiler.stage("inference"):
+            img = detector.findHands(img, timestamp=cap.get(cv2.CAP_PROP_POS_MSEC))
         lmList = detector.findPosition(img)
 
         if len(lmList) != 0:
@@ -63,9 +87,12 @@ def main():
 
         cv2.imshow("Image", img)
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        key = cv2.waitKey(1) & 0xFF
+        profiler.frameEnd(key)
+        if key == ord('q'):
             break
 
+    profiler.close()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -0,0 +1,398 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+import BatchDetectors
+import Sense
+import Think
+from LandmarkBackends import createBackend
+
+logger = logging.getLogger(__name__)
+
+
+class SessionState:
+    def __init__(self, maxPositions=30, threshold=15):
+        """
+        Per-session detector state kept on the server.
+        Args:
+            maxPositions, threshold: WaveDetector settings.
+        """
+        self.lock = threading.Lock()
+        self.think = Think.Think(None)
+        self.xPositions = deque(maxlen=maxPositions)
+        self.threshold = threshold
+        self.waving = False
+        self.gripState = None
+        self.fingers = None
+        self.frames = 0
+        self.lastSeen = time.monotonic()
+
+    def update(self, hand, width, height, instruction, sense):
+        """Update the state with one frame's hand landmarks and return the features and feedback events."""
+        self.frames += 1
+        self.lastSeen = time.monotonic()
+        events = []
+        if hand is None:
+            return None, events
+
+        landmarks = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark]])
+        points = BatchDetectors.toPixels(landmarks, width, height)
+        movements = {name: bool(value) for name, value in sense.extract_hand_movements(hand).items()}
+
+        self.xPositions.append(points[0, 8, 0])
+        waving = bool(BatchDetectors.detectDirectionChanges(list(self.xPositions), self.xPositions.maxlen,
+                                                            self.threshold)[-1])
+        if waving and not self.waving:
+            events.append({"type": "wave"})
+        self.waving = waving
+
+        grip = BatchDetectors.analyzeGrip(points)
+        gripState = "full" if grip["full"][0] else "partial" if grip["partial"][0] else "open"
+        if gripState != self.gripState:
+            events.append({"type": "grip", "state": gripState, "score": float(grip["score"][0])})
+        self.gripState = gripState
+
+        fingers = int(BatchDetectors.countFingers(points)[0])
+        if fingers != self.fingers:
+            events.append({"type": "fingers", "count": fingers})
+        self.fingers = fingers
+
+        if instruction:
+            self.think.set_instruction(instruction)
+            self.think.update_state(movements)
+            events.append({"type": "instruction", "instruction": instruction, "state": self.think.get_state()})
+
+        return {"landmarks": landmarks[0].tolist(), "movements": movements}, events
+
+
+class FrameRequest:
+    def __init__(self, sessionId, jpeg, instruction):
+        self.sessionId = sessionId
+        self.jpeg = jpeg
+        self.instruction = instruction
+        self.received = time.perf_counter()
+        self.done = threading.Event()
+        self.status = 200
+        self.response = None
+
+    def fail(self, status, message):
+        self.status = status
+        self.response = {"error": message}
+
+
+class InferencePool:
+    def __init__(self, workers=2, batchSize=8, maxWaitMs=5, modelComplexity=1, requestTimeout=10,
+                 sessionTtl=300, backend=None):
+        """
+        Worker pool that collects queued frames into micro-batches.
+        Each session is assigned to one worker, so its frames are applied to its state in arrival order.
+        A worker decodes a batch in parallel, then runs the frames through its landmark model one by one:
+        MediaPipe takes a single image per call, so batching only amortises the wakeup and the decode.
+        Args:
+            workers: Number of inference workers, each with its own landmark backend.
+            batchSize: Maximum number of frames per micro-batch.
+            maxWaitMs: How long a worker waits for more frames after the first one of a batch.
+            modelComplexity: MediaPipe model complexity.
+            requestTimeout: Seconds a request waits for its result before the server answers 503.
+            sessionTtl: Seconds without frames after which a session is dropped, for clients that disconnect
+                without closing it.
+            backend: Landmark backend spec for createBackend; None uses $SELINSEV_BACKEND (MediaPipe by default).
+        """
+        self.batchSize = batchSize
+        self.maxWait = maxWaitMs / 1000
+        self.modelComplexity = modelComplexity
+        self.backend = backend
+        self.requestTimeout = requestTimeout
+        self.sessionTtl = sessionTtl
+        self.nextExpiry = time.monotonic() + sessionTtl
+        self.expiredSessions = 0
+        self.queues = [queue.Queue() for _ in range(workers)]  # One per worker, see _queue
+        self.backendErrors = []  # Workers whose landmark backend could not be created
+        self.sessions = {}
+        self.sessionsLock = threading.Lock()
+        # Sense only reads landmark objects, so one instance serves every session
+        self.sense = Sense.Sense()
+        self.decoder = ThreadPoolExecutor(max_workers=workers * 2)
+        self.batches = 0
+        self.frames = 0
+        self.threads = [threading.Thread(target=self._work, args=(requests,), daemon=True) for requests in self.queues]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, sessionId, jpeg, instruction=None):
+        """
+        Queue a JPEG frame of a session and wait for its result.
+        Returns:
+            tuple: (HTTP status, response payload).
+        """
+        request = FrameRequest(sessionId, jpeg, instruction)
+        self._queue(sessionId).put(request)
+        if not request.done.wait(self.requestTimeout):
+            return 503, {"error": "Timed out waiting for inference"}
+        return request.status, request.response
+
+    def _queue(self, sessionId):
+        # Two workers handling frames of the same session at once could apply them out of order
+        return self.queues[hash(sessionId) % len(self.queues)]
+
+    @property
+    def queued(self):
+        return sum(requests.qsize() for requests in self.queues)
+
+    def closeSession(self, sessionId):
+        with self.sessionsLock:
+            return self.sessions.pop(sessionId, None) is not None
+
+    def _expireSessions(self, now):
+        # Called with sessionsLock held; scans at most once per TTL / 10
+        self.nextExpiry = now + self.sessionTtl / 10
+        expired = [sessionId for sessionId, session in self.sessions.items()
+                   if now - session.lastSeen > self.sessionTtl]
+        for sessionId in expired:
+            del self.sessions[sessionId]
+        if expired:
+            self.expiredSessions += len(expired)
+            logger.info("Expired %d idle sessions", len(expired))
+
+    def _session(self, sessionId):
+        now = time.monotonic()
+        with self.sessionsLock:
+            if now >= self.nextExpiry:
+                self._expireSessions(now)
+            if sessionId not in self.sessions:
+                self.sessions[sessionId] = SessionState()
+            return self.sessions[sessionId]
+
+    def _collect(self, requests):
+        batch = [requests.get()]
+        deadline = time.perf_counter() + self.maxWait
+        while len(batch) < self.batchSize:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _decode(request):
+        try:
+            return cv2.imdecode(np.frombuffer(request.jpeg, np.uint8), cv2.IMREAD_COLOR)
+        except cv2.error:
+            return None
+
+    def _process(self, hands, request, image):
+        results = hands.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        hand = results.multi_hand_landmarks[0] if results.multi_hand_landmarks else None
+        session = self._session(request.sessionId)
+        with session.lock:
+            features, events = session.update(hand, image.shape[1], image.shape[0], request.instruction, self.sense)
+        request.response = {
+            "session": request.sessionId,
+            "frame": session.frames,
+            "hand": features,
+            "events": events,
+            "serverMs": (time.perf_counter() - request.received) * 1000,
+        }
+
+    def _work(self, requests):
+        # Frames of different sessions are interleaved, so every frame is processed on its own
+        try:
+            hands = createBackend(self.backend, maxHands=1, modelComplexity=self.modelComplexity, staticMode=True)
+        except Exception as e:
+            logger.exception("Could not create the landmark backend")
+            self.backendErrors.append(f"{type(e).__name__}: {e}")
+            # Answer this worker's sessions right away instead of letting every request time out
+            while True:
+                request = requests.get()
+                request.fail(503, "Landmark backend unavailable")
+                request.done.set()
+
+        while True:
+            batch = self._collect(requests)
+            images = list(self.decoder.map(self._decode, batch))
+            for request, image in zip(batch, images):
+                # A failing frame must neither kill the worker nor leave its client waiting
+                try:
+                    if time.perf_counter() - request.received > self.requestTimeout:
+                        request.fail(503, "Timed out waiting for inference")  # Client already answered
+                    elif image is None:
+                        request.fail(400, "Could not decode frame")
+                    else:
+                        self._process(hands, request, image)
+                except Exception:
+                    logger.exception("Inference failed for session %s", request.sessionId)
+                    request.fail(500, "Inference failed")
+                finally:
+                    request.done.set()
+            self.batches += 1
+            self.frames += len(batch)
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    pool = None  # Set by serve()
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        url = urllib.parse.urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, urllib.parse.parse_qs(url.query)
+
+    def do_POST(self):
+        # POST /sessions/<id>/frames with a JPEG body, optional ?instruction=<Think instruction>
+        parts, query = self._route()
+        if len(parts) != 3 or parts[0] != "sessions" or parts[2] != "frames":
+            self._send(404, {"error": "Not found"})
+            return
+        jpeg = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        instruction = query.get("instruction", [None])[0]
+        self._send(*self.pool.submit(parts[1], jpeg, instruction))
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == "sessions":
+            self._send(200, {"closed": self.pool.closeSession(parts[1])})
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_GET(self):
+        parts, _ = self._route()
+        if parts == ["stats"]:
+            pool = self.pool
+            self._send(200, {"sessions": len(pool.sessions), "expiredSessions": pool.expiredSessions,
+                             "frames": pool.frames, "batches": pool.batches,
+                             "meanBatch": pool.frames / pool.batches if pool.batches else 0,
+                             "queued": pool.queued, "backendErrors": pool.backendErrors})
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        pass  # One line per frame would flood the console
+
+
+def serve(host="127.0.0.1", port=8765, **poolArgs):
+    InferenceHandler.pool = InferencePool(**poolArgs)
+    server = ThreadingHTTPServer((host, port), InferenceHandler)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def loadTest(video, url="http://127.0.0.1:8765", sessions=4, maxFrames=300, quality=80):
+    """
+    Replay a video file as several concurrent sessions and report latency percentiles.
+    Args:
+        video: Path to the video file.
+        url: Base URL of the server.
+        sessions: Number of concurrent sessions.
+        maxFrames: Number of frames of the video to replay per session.
+        quality: JPEG quality used to encode the frames.
+    Returns:
+        dict: Latency percentiles in milliseconds and overall throughput.
+    """
+    # Frames are encoded once up front so the client's own encoding does not skew the measurement
+    cap = cv2.VideoCapture(video)
+    jpegs = []
+    while len(jpegs) < maxFrames:
+        success, frame = cap.read()
+        if not success:
+            break
+        jpegs.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    cap.release()
+    if not jpegs:
+        raise ValueError(f"Could not read frames from {video}")
+
+    latencies = []
+    latenciesLock = threading.Lock()
+
+    def runSession(index):
+        sessionUrl = f"{url}/sessions/loadtest-{index}"
+        own = []
+        for jpeg in jpegs:
+            request = urllib.request.Request(f"{sessionUrl}/frames", data=jpeg, method="POST",
+                                             headers={"Content-Type": "image/jpeg"})
+            sTime = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            own.append((time.perf_counter() - sTime) * 1000)
+        urllib.request.urlopen(urllib.request.Request(sessionUrl, method="DELETE")).read()
+        with latenciesLock:
+            latencies.extend(own)
+
+    sTime = time.perf_counter()
+    threads = [threading.Thread(target=runSession, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - sTime
+
+    report = {
+        "sessions": sessions,
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+    }
+    print(f"{sessions} sessions, {report['frames']} frames in {elapsed:.1f} s ({report['fps']:.1f} fps) - "
+          f"latency p50 {report['p50']:.1f} ms, p90 {report['p90']:.1f} ms, p99 {report['p99']:.1f} ms, "
+          f"max {report['max']:.1f} ms")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared landmark inference server for bedside clients.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serveParser = commands.add_parser("serve")
+    serveParser.add_argument("--host", default="127.0.0.1")
+    serveParser.add_argument("--port", type=int, default=8765)
+    serveParser.add_argument("--workers", type=int, default=2)
+    serveParser.add_argument("--batch-size", type=int, default=8)
+    serveParser.add_argument("--max-wait-ms", type=float, default=5)
+    serveParser.add_argument("--model-complexity", type=int, default=1)
+    serveParser.add_argument("--backend", default=None, help="Landmark backend, e.g. mediapipe:0 or synthetic")
+    serveParser.add_argument("--session-ttl", type=float, default=300, help="Seconds before an idle session expires")
+    loadParser = commands.add_parser("loadtest")
+    loadParser.add_argument("video")
+    loadParser.add_argument("--url", default="http://127.0.0.1:8765")
+    loadParser.add_argument("--sessions", type=int, default=4)
+    loadParser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, workers=args.workers, batchSize=args.batch_size, maxWaitMs=args.max_wait_ms,
+              modelComplexity=args.model_complexity, sessionTtl=args.session_ttl,
+              backend=args.backend)
+    else:
+        loadTest(args.video, args.url, args.sessions, args.frames)
+
+
+if __name__ == "__main__":
+    main()
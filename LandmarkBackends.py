@@ -0,0 +1,515 @@
+import argparse
+import bisect
+import math
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from enum import IntEnum
+import cv2
+
+# Result types with the attribute layout of MediaPipe Hands results, so code written against
+# results.multi_hand_landmarks[i].landmark[j].x and results.multi_handedness[i].classification[0].score
+# works with every backend.
+Landmark = namedtuple("Landmark", "x y z")
+LandmarkList = namedtuple("LandmarkList", "landmark")
+Classification = namedtuple("Classification", "index score label")
+ClassificationList = namedtuple("ClassificationList", "classification")
+HandResults = namedtuple("HandResults", "multi_hand_landmarks multi_handedness")
+
+# MediaPipe leaves both fields unset (None) when no hand is found
+NO_HANDS = HandResults(None, None)
+
+
+class HandLandmark(IntEnum):
+    """Landmark indices, identical to mediapipe.solutions.hands.HandLandmark."""
+    WRIST = 0
+    THUMB_CMC = 1
+    THUMB_MCP = 2
+    THUMB_IP = 3
+    THUMB_TIP = 4
+    INDEX_FINGER_MCP = 5
+    INDEX_FINGER_PIP = 6
+    INDEX_FINGER_DIP = 7
+    INDEX_FINGER_TIP = 8
+    MIDDLE_FINGER_MCP = 9
+    MIDDLE_FINGER_PIP = 10
+    MIDDLE_FINGER_DIP = 11
+    MIDDLE_FINGER_TIP = 12
+    RING_FINGER_MCP = 13
+    RING_FINGER_PIP = 14
+    RING_FINGER_DIP = 15
+    RING_FINGER_TIP = 16
+    PINKY_MCP = 17
+    PINKY_PIP = 18
+    PINKY_DIP = 19
+    PINKY_TIP = 20
+
+
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+)
+
+
+def drawLandmarks(img, handLandmarks, landmarkColor=(0, 0, 255), connectionColor=(255, 255, 255)):
+    """Draw one hand's landmarks and connections in the style of mediapipe's drawing_utils."""
+    h, w = img.shape[:2]
+    points = [(int(lm.x * w), int(lm.y * h)) for lm in handLandmarks.landmark]
+    for start, end in HAND_CONNECTIONS:
+        cv2.line(img, points[start], points[end], connectionColor, 2)
+    for point in points:
+        cv2.circle(img, point, 2, landmarkColor, 2)
+    return img
+
+
+def resultsFromHands(hands):
+    """
+    Build a results object from a list of (points, score, label) tuples, points being 21 (x, y, z) triples.
+    """
+    if not hands:
+        return NO_HANDS
+    return HandResults(
+        [LandmarkList([Landmark(*point) for point in points]) for points, _, _ in hands],
+        [ClassificationList([Classification(index, score, label)])
+         for index, (_, score, label) in enumerate(hands)])
+
+
+class LandmarkBackend(ABC):
+    """
+    A source of hand landmarks. process() takes an RGB image and returns results shaped like MediaPipe's.
+    """
+
+    name = "backend"
+
+    @abstractmethod
+    def process(self, image, timestamp=None):
+        """
+        Return the hand landmarks of an RGB image.
+        Args:
+            image: RGB image.
+            timestamp: Capture position of the frame in ms (cv2.CAP_PROP_POS_MSEC). Backends that replay or
+                generate a sequence use it to pick their frame, so skipped frames do not shift the sequence.
+        """
+
+    def setModelComplexity(self, modelComplexity):
+        """Switch model variant if the backend has any; ignored otherwise."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MediaPipeBackend(LandmarkBackend):
+    """MediaPipe Hands at a given model complexity (0 = lite, 1 = full)."""
+
+    def __init__(self, staticMode=False, maxHands=2, modelComplexity=1, detectionCon=0.5, trackCon=0.5):
+        # Imported here so the other backends work on machines without MediaPipe
+        import mediapipe as mp
+
+        self.mpHands = mp.solutions.hands
+        self.staticMode = staticMode
+        self.maxHands = maxHands
+        self.modelComplexity = modelComplexity
+        self.detectionCon = detectionCon
+        self.trackCon = trackCon
+        self.hands = self._createHands()
+
+    @property
+    def name(self):
+        return f"mediapipe:{self.modelComplexity}"
+
+    def _createHands(self):
+        return self.mpHands.Hands(self.staticMode, self.maxHands,
+                                  model_complexity=self.modelComplexity,
+                                  min_detection_confidence=self.detectionCon,
+                                  min_tracking_confidence=self.trackCon)
+
+    def process(self, image, timestamp=None):
+        return self.hands.process(image)
+
+    def setModelComplexity(self, modelComplexity):
+        """Rebuild the MediaPipe graph with a different model complexity."""
+        if modelComplexity == self.modelComplexity:
+            return
+        self.hands.close()
+        self.modelComplexity = modelComplexity
+        self.hands = self._createHands()
+
+    def close(self):
+        self.hands.close()
+
+
+class ReplayBackend(LandmarkBackend):
+    """
+    Replays landmarks written by recordLandmarks. Frames are looked up by capture timestamp, so replaying
+    alongside the recorded video stays in sync however many frames the caller skips; without a timestamp,
+    each process() call returns the next recorded frame.
+    """
+
+    def __init__(self, path, loop=False):
+        """
+        Args:
+            path: .npz file written by recordLandmarks.
+            loop: Start over at the end of the recording instead of reporting no hands.
+        """
+        import numpy as np
+
+        data = np.load(path)
+        self.name = f"replay:{os.path.basename(path)}"
+        self.landmarks = data["landmarks"]
+        self.counts = data["counts"]
+        self.scores = data["scores"]
+        self.labels = data["labels"]
+        self.timestamps = data["timestamps"]
+        # Recorded frame spacing; a timestamp further than this from every recorded frame has no landmarks
+        self.interval = float(np.median(np.diff(self.timestamps))) if len(self.timestamps) > 1 else 1000 / 30
+        self.loop = loop
+        self.frame = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def indexAt(self, timestamp):
+        """Index of the recorded frame nearest to a timestamp in ms, or None if it is outside the recording."""
+        if len(self) == 0:
+            return None
+        duration = self.timestamps[-1] + self.interval
+        if self.loop and timestamp >= duration:
+            timestamp %= duration
+        after = bisect.bisect_left(self.timestamps, timestamp)
+        candidates = [index for index in (after - 1, after) if 0 <= index < len(self)]
+        index = min(candidates, key=lambda index: abs(self.timestamps[index] - timestamp))
+        if abs(self.timestamps[index] - timestamp) > self.interval:
+            return None
+        return index
+
+    def process(self, image, timestamp=None):
+        if timestamp is not None:
+            index = self.indexAt(timestamp)
+            if index is None:
+                return NO_HANDS
+        else:
+            index = self.frame
+            self.frame += 1
+            if index >= len(self):
+                if not self.loop or len(self) == 0:
+                    return NO_HANDS
+                index %= len(self)
+        return resultsFromHands([(self.landmarks[index, hand].tolist(), float(self.scores[index, hand]),
+                                  str(self.labels[index, hand])) for hand in range(self.counts[index])])
+
+
+# Finger curl from 0.0 (extended) to 1.0 (fully bent) for thumb, index, middle, ring and pinky
+POSES = {
+    "open": (0, 0, 0, 0, 0),
+    "fist": (1, 1, 1, 1, 1),
+    "one": (1, 0, 1, 1, 1),
+    "two": (1, 0, 0, 1, 1),
+    "three": (1, 0, 0, 0, 1),
+    "four": (1, 0, 0, 0, 0),
+    "thumbs_up": (0, 1, 1, 1, 1),
+    "none": None,  # No hand in view
+}
+
+# Hand geometry in palm lengths (wrist to middle MCP), y pointing down as in image coordinates
+_THUMB_CMC = (-0.2, -0.15)
+_THUMB_SEGMENTS = (0.3, 0.25, 0.22)
+_THUMB_DIRECTION = (-0.8, -0.6)
+_THUMB_BEND = (30, 60, 50)  # In-plane rotation towards the palm per joint at full curl, degrees
+_FINGER_MCPS = ((-0.3, -0.95), (0.0, -1.0), (0.25, -0.95), (0.45, -0.85))
+_FINGER_SEGMENTS = ((0.4, 0.25, 0.2), (0.45, 0.28, 0.22), (0.42, 0.26, 0.2), (0.32, 0.2, 0.18))
+_FINGER_SPREAD = (-8, 0, 8, 16)  # Degrees from straight up
+_FINGER_BEND = (90, 100, 70)  # Flexion towards the camera per joint at full curl, degrees
+
+
+def _rotate(vector, degrees):
+    angle = math.radians(degrees)
+    cos, sin = math.cos(angle), math.sin(angle)
+    return vector[0] * cos - vector[1] * sin, vector[0] * sin + vector[1] * cos
+
+
+def handPoints(curls, center=(0.5, 0.6), scale=0.25, roll=0.0, aspect=4 / 3):
+    """
+    Generate 21 normalized landmarks of a right hand, palm facing the camera, fingers pointing up.
+    Args:
+        curls: Curl of thumb, index, middle, ring and pinky, 0.0 (extended) to 1.0 (fully bent).
+        center: Normalized image position of the wrist.
+        scale: Palm length as a fraction of the image height.
+        roll: In-plane rotation of the hand around the wrist, degrees.
+        aspect: Image width / height, so the hand keeps its shape in pixels.
+    Returns:
+        list: 21 (x, y, z) tuples in MediaPipe's normalized coordinates.
+    """
+    local = [(0.0, 0.0, 0.0)]
+
+    # Thumb: bends in the image plane, across the palm
+    x, y = _THUMB_CMC
+    local.append((x, y, 0.0))
+    angle = 0.0
+    for length, bend in zip(_THUMB_SEGMENTS, _THUMB_BEND):
+        angle += bend * curls[0]
+        dx, dy = _rotate(_THUMB_DIRECTION, angle)
+        x, y = x + dx * length, y + dy * length
+        local.append((x, y, 0.0))
+
+    # Fingers: flex towards the camera, which shortens them in the image
+    for mcp, segments, spread, curl in zip(_FINGER_MCPS, _FINGER_SEGMENTS, _FINGER_SPREAD, curls[1:]):
+        x, y = mcp
+        z = 0.0
+        local.append((x, y, z))
+        direction = _rotate((0.0, -1.0), spread)
+        flexion = 0.0
+        for length, bend in zip(segments, _FINGER_BEND):
+            flexion += math.radians(bend * curl)
+            x += direction[0] * length * math.cos(flexion)
+            y += direction[1] * length * math.cos(flexion)
+            z -= length * math.sin(flexion)
+            local.append((x, y, z))
+
+    points = []
+    for x, y, z in local:
+        x, y = _rotate((x, y), roll)
+        points.append((center[0] + x * scale / aspect, center[1] + y * scale, z * scale))
+    return points
+
+
+class SyntheticBackend(LandmarkBackend):
+    """
+    Deterministic, parameterized hand poses for running the detection logic without a camera or model.
+    The image passed to process() is ignored; frame n of the script is the same on every run. The frame is
+    taken from the capture timestamp at the given fps when there is one, and counts process() calls otherwise.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, script=("open", "fist"), framesPerPose=30, transition=10, wave=0.0, wavePeriod=20,
+                 noise=0.0, seed=0, center=(0.5, 0.6), scale=0.25, score=0.95, fps=30):
+        """
+        Args:
+            script: Pose names from POSES, or curl tuples, shown in turn and repeated.
+            framesPerPose: Frames each pose is shown, including the transition into the next one.
+            transition: Frames of linear blending into the next pose.
+            wave: Amplitude of a horizontal wave motion, as a fraction of the image width.
+            wavePeriod: Frames per wave cycle.
+            noise: Standard deviation of Gaussian jitter added to every coordinate.
+            seed: Seed of the jitter.
+            center: Normalized wrist position.
+            scale: Palm length as a fraction of the image height.
+            score: Reported handedness score.
+            fps: Script frames per second of capture timestamp.
+        """
+        self.script = [POSES[pose] if isinstance(pose, str) else pose for pose in script]
+        self.framesPerPose = framesPerPose
+        self.transition = min(transition, framesPerPose)
+        self.wave = wave
+        self.wavePeriod = wavePeriod
+        self.noise = noise
+        self.center = center
+        self.scale = scale
+        self.score = score
+        self.fps = fps
+        self.random = random.Random(seed)
+        self.frame = 0
+
+    def curlsAt(self, frame):
+        """Finger curls of a script frame, or None if no hand is shown."""
+        step, offset = divmod(frame, self.framesPerPose)
+        current = self.script[step % len(self.script)]
+        following = self.script[(step + 1) % len(self.script)]
+        blend = (offset - (self.framesPerPose - self.transition)) / self.transition if self.transition else 0
+        if current is None or following is None or blend <= 0:
+            return current
+        return tuple(a + (b - a) * blend for a, b in zip(current, following))
+
+    def process(self, image, timestamp=None):
+        if timestamp is not None:
+            frame = int(round(timestamp * self.fps / 1000))
+        else:
+            frame = self.frame
+            self.frame += 1
+        curls = self.curlsAt(frame)
+        if curls is None:
+            return NO_HANDS
+        center = (self.center[0] + self.wave * math.sin(2 * math.pi * frame / self.wavePeriod), self.center[1])
+        aspect = image.shape[1] / image.shape[0] if image is not None else 4 / 3
+        points = handPoints(curls, center, self.scale, aspect=aspect)
+        if self.noise:
+            points = [tuple(value + self.random.gauss(0, self.noise) for value in point) for point in points]
+        return resultsFromHands([(points, self.score, "Right")])
+
+
+def createBackend(spec=None, maxHands=2, modelComplexity=1, detectionCon=0.5, trackCon=0.5, staticMode=False):
+    """
+    Create a landmark backend from a spec string.
+    Args:
+        spec: "mediapipe" or "mediapipe:<complexity>", "replay:<path.npz>", "synthetic" or
+            "synthetic:<pose>,<pose>,...". None uses $SELINSEV_BACKEND, defaulting to "mediapipe".
+        maxHands, modelComplexity, detectionCon, trackCon, staticMode: MediaPipe settings.
+    Returns:
+        LandmarkBackend: The backend.
+    """
+    spec = spec or os.environ.get("SELINSEV_BACKEND") or "mediapipe"
+    name, _, argument = spec.partition(":")
+    if name == "mediapipe":
+        return MediaPipeBackend(staticMode, maxHands, int(argument) if argument else modelComplexity,
+                                detectionCon, trackCon)
+    if name == "replay":
+        return ReplayBackend(argument)
+    if name == "synthetic":
+        return SyntheticBackend(argument.split(",")) if argument else SyntheticBackend()
+    raise ValueError(f"Unknown landmark backend: {spec}")
+
+
+def _frames(videoPath, maxFrames=None):
+    """Yield (timestamp in ms, BGR frame, RGB frame) for the frames of a video."""
+    cap = cv2.VideoCapture(videoPath)
+    count = 0
+    try:
+        while maxFrames is None or count < maxFrames:
+            success, frame = cap.read()
+            if not success:
+                break
+            count += 1
+            yield cap.get(cv2.CAP_PROP_POS_MSEC), frame, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        cap.release()
+
+
+def recordLandmarks(videoPath, backend, outPath, maxFrames=None):
+    """
+    Run a backend over a video and save its landmarks for ReplayBackend.
+    Returns:
+        int: Number of frames recorded.
+    """
+    import numpy as np
+
+    maxHands = getattr(backend, "maxHands", 2)
+    landmarks, counts, scores, labels, timestamps = [], [], [], [], []
+    for timestamp, _, rgb in _frames(videoPath, maxFrames):
+        results = backend.process(rgb, timestamp)
+        frameLandmarks = np.zeros((maxHands, 21, 3), dtype=np.float32)
+        frameScores = np.zeros(maxHands, dtype=np.float32)
+        frameLabels = [""] * maxHands
+        hands = list(zip(results.multi_hand_landmarks or [], results.multi_handedness or []))[:maxHands]
+        for hand, (handLandmarks, handedness) in enumerate(hands):
+            frameLandmarks[hand] = [(lm.x, lm.y, lm.z) for lm in handLandmarks.landmark]
+            frameScores[hand] = handedness.classification[0].score
+            frameLabels[hand] = handedness.classification[0].label
+        landmarks.append(frameLandmarks)
+        counts.append(len(hands))
+        scores.append(frameScores)
+        labels.append(frameLabels)
+        timestamps.append(timestamp)
+    np.savez_compressed(outPath, landmarks=np.array(landmarks).reshape(-1, maxHands, 21, 3),
+                        counts=np.array(counts, dtype=np.int8), scores=np.array(scores).reshape(-1, maxHands),
+                        labels=np.array(labels, dtype=str).reshape(-1, maxHands),
+                        timestamps=np.array(timestamps, dtype=float))
+    return len(counts)
+
+
+def compareBackends(videoPath, specs, maxFrames=None, pckThreshold=0.2):
+    """
+    Run several backends over the same video frames and report latency and agreement with the first one.
+    Agreement is measured on the first hand in pixel coordinates, normalized by the reference palm length
+    (wrist to middle MCP): the mean landmark error and the fraction of landmarks within pckThreshold of
+    the reference (PCK).
+    Args:
+        videoPath: Video file to read.
+        specs: Backend specs for createBackend; the first one is the reference.
+        maxFrames: Limit on the number of frames.
+        pckThreshold: PCK distance threshold in palm lengths.
+    Returns:
+        list: One dict of statistics per backend, in the order of specs.
+    """
+    import numpy as np
+
+    backends = [createBackend(spec, maxHands=1) for spec in specs]
+    latencies = [[] for _ in backends]
+    points = [[] for _ in backends]
+    try:
+        for timestamp, frame, rgb in _frames(videoPath, maxFrames):
+            size = np.array([frame.shape[1], frame.shape[0]], dtype=float)
+            for i, backend in enumerate(backends):
+                start = time.perf_counter()
+                results = backend.process(rgb, timestamp)
+                latencies[i].append(time.perf_counter() - start)
+                if results.multi_hand_landmarks:
+                    hand = results.multi_hand_landmarks[0].landmark
+                    points[i].append(np.array([(lm.x, lm.y) for lm in hand]) * size)
+                else:
+                    points[i].append(None)
+    finally:
+        for backend in backends:
+            backend.close()
+
+    reference = points[0]
+    report = []
+    for backend, times, hands in zip(backends, latencies, points):
+        times = np.array(times) * 1000
+        stats = {
+            "backend": backend.name,
+            "frames": len(times),
+            "detected": sum(hand is not None for hand in hands),
+            "mean_ms": float(times.mean()) if len(times) else 0.0,
+            "p95_ms": float(np.percentile(times, 95)) if len(times) else 0.0,
+            "presence_agreement": float(np.mean([(a is None) == (b is None) for a, b in zip(hands, reference)]))
+            if hands else 0.0,
+        }
+        errors = []
+        for hand, ref in zip(hands, reference):
+            if hand is not None and ref is not None:
+                palm = max(np.linalg.norm(ref[HandLandmark.MIDDLE_FINGER_MCP] - ref[HandLandmark.WRIST]), 1e-6)
+                errors.append(np.linalg.norm(hand - ref, axis=1) / palm)
+        if errors:
+            errors = np.concatenate(errors)
+            stats["mean_error"] = float(errors.mean())
+            stats["pck"] = float(np.mean(errors < pckThreshold))
+        report.append(stats)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record landmarks or compare landmark backends on a video.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare = commands.add_parser("compare", help="Latency and landmark agreement of backends on one video.")
+    compare.add_argument("video")
+    compare.add_argument("backends", nargs="+", help="Backend specs, e.g. mediapipe:1 mediapipe:0 replay:rec.npz; "
+                                                     "the first one is the reference")
+    compare.add_argument("--frames", type=int, default=None)
+    compare.add_argument("--pck", type=float, default=0.2, help="PCK threshold in palm lengths")
+
+    record = commands.add_parser("record", help="Save a backend's landmarks for replay.")
+    record.add_argument("video")
+    record.add_argument("output", help="Output .npz file")
+    record.add_argument("--backend", default="mediapipe:1")
+    record.add_argument("--frames", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        with createBackend(args.backend) as backend:
+            count = recordLandmarks(args.video, backend, args.output, args.frames)
+        print(f"Recorded {count} frames to {args.output}")
+        return
+
+    print(f"{'backend':<24}{'frames':>8}{'detected':>10}{'mean ms':>10}{'p95 ms':>10}{'presence':>10}"
+          f"{'error':>8}{'pck':>8}")
+    for stats in compareBackends(args.video, args.backends, args.frames, args.pck):
+        error = f"{stats['mean_error']:.3f}" if "mean_error" in stats else "-"
+        pck = f"{stats['pck']:.1%}" if "pck" in stats else "-"
+        print(f"{stats['backend']:<24}{stats['frames']:>8}{stats['detected']:>10}{stats['mean_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['presence_agreement']:>10.1%}{error:>8}{pck:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+from FrameBufferPool import FrameBufferPool
+
+
+class MotionGate:
+    def __init__(self, threshold=4.0, size=(32, 24), maxSkipped=30):
+        """
+        Decide whether a frame differs enough from the last inferred frame to be worth running
+        landmark inference on it.
+        Args:
+            threshold: Mean absolute grayscale difference (0-255) below which a frame is gated.
+            size: Size (width, height) of the thumbnail the frames are compared on.
+            maxSkipped: Maximum number of consecutive gated frames before inference is forced,
+                        so slow drift is still picked up.
+        """
+        self.threshold = threshold
+        self.size = size
+        self.maxSkipped = maxSkipped
+        self.reference = None  # Thumbnail of the last inferred frame
+        self.pool = FrameBufferPool()  # Thumbnail and difference buffers, reused every frame
+        self.skipped = 0
+        self.gatedFrames = 0
+        self.inferredFrames = 0
+
+    def thumbnail(self, frame):
+        # Downscale first so the color conversion only touches a few hundred pixels
+        small = self.pool.resize(frame, self.size, "small")
+        return self.pool.cvtColor(small, cv2.COLOR_BGR2GRAY, "gray")
+
+    def shouldInfer(self, frame):
+        """
+        Args:
+            frame: The current BGR frame.
+        Returns:
+            bool: True if inference should run on this frame, False to reuse the cached results.
+        """
+        small = self.thumbnail(frame)
+        if self.reference is not None and self.skipped < self.maxSkipped:
+            diff = self.pool.absdiff(small, self.reference, "diff")
+            if cv2.mean(diff)[0] < self.threshold:
+                self.skipped += 1
+                self.gatedFrames += 1
+                return False
+
+        if self.reference is None:
+            self.reference = small.copy()
+        else:
+            np.copyto(self.reference, small)
+        self.skipped = 0
+        self.inferredFrames += 1
+        return True
+
+    def reset(self):
+        """Forget the reference frame, e.g. when the camera or exercise changes."""
+        self.reference = None
+        self.skipped = 0
+
+    @property
+    def gatedRatio(self):
+        total = self.gatedFrames + self.inferredFrames
+        return self.gatedFrames / total if total else 0
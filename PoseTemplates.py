@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from scipy.spatial import cKDTree
+import HandTrackingModule as HTM
+from CameraManager import openCamera
+
+
+def landmarkArray(handLandmarks, width, height):
+    """
+    Convert one hand's MediaPipe landmarks to an array in units of the frame height.
+    Normalized x (and z, which MediaPipe scales like x) are fractions of the frame width, so they are scaled
+    by width / height; otherwise a rotated hand changes shape and normalizePose is not rotation-invariant.
+    Args:
+        handLandmarks: A results.multi_hand_landmarks entry.
+        width, height: Size of the frame the landmarks were detected on.
+    Returns:
+        np.ndarray: Array of shape (21, 3).
+    """
+    aspect = width / height
+    return np.array([(lm.x * aspect, lm.y, lm.z * aspect) for lm in handLandmarks.landmark])
+
+
+def normalizePose(landmarks):
+    """
+    Normalize hand landmarks for position, scale and in-plane rotation.
+    The wrist is moved to the origin, the hand is scaled so the wrist to middle finger MCP distance is 1,
+    and rotated so that direction points along -y (fingers up).
+    Args:
+        landmarks: Array of shape (..., 21, 3) or (..., 21, 2) in pixel coordinates, or any unit that is the
+            same along x and y (see landmarkArray); raw normalized landmarks are not.
+    Returns:
+        np.ndarray: Array of shape (..., 63) (or (..., 42) for 2D input) of pose vectors.
+    """
+    points = np.asarray(landmarks, dtype=float)
+    points = points - points[..., :1, :]
+    axis = points[..., 9, :2]
+    palm = np.maximum(np.linalg.norm(axis, axis=-1), 1e-6)
+    cos = -axis[..., 1] / palm
+    sin = -axis[..., 0] / palm
+
+    # Rotate x/y so the palm axis maps to (0, -1); z is only scaled
+    x = points[..., 0] * cos[..., np.newaxis] - points[..., 1] * sin[..., np.newaxis]
+    y = points[..., 0] * sin[..., np.newaxis] + points[..., 1] * cos[..., np.newaxis]
+    rotated = np.stack([x, y] + ([points[..., 2]] if points.shape[-1] > 2 else []), axis=-1)
+    rotated = rotated / palm[..., np.newaxis, np.newaxis]
+    return rotated.reshape(rotated.shape[:-2] + (-1,))
+
+
+class PoseIndex:
+    def __init__(self, vectors=None, labels=None):
+        """
+        Nearest-neighbour index of normalized template poses.
+        Args:
+            vectors: Array of shape (M, D) of pose vectors (see normalizePose).
+            labels: List of M labels, one per template.
+        """
+        self.vectors = np.empty((0, 63)) if vectors is None else vectors
+        self.labels = [] if labels is None else list(labels)
+        self.tree = None
+        self._pending = []  # Templates added since the tree was last built
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, landmarks, label):
+        """Add a template pose recorded from landmarks of shape (21, 3)."""
+        self._pending.append(normalizePose(landmarks))
+        self.labels.append(label)
+        self.tree = None
+
+    def build(self):
+        if self._pending:
+            self.vectors = np.vstack([np.asarray(self.vectors)] + self._pending)
+            self._pending = []
+        # copy_data=False keeps a memory-mapped array as the tree's data instead of copying it
+        self.tree = cKDTree(self.vectors, copy_data=False) if len(self.labels) else None
+
+    def classify(self, landmarks, maxDistance=np.inf, k=1):
+        """
+        Find the template(s) nearest to a pose.
+        Args:
+            landmarks: Array of shape (21, 3) with the landmarks of one hand.
+            maxDistance: Distances above this return no match.
+            k: Number of nearest templates to return.
+        Returns:
+            list: (label, distance) pairs, nearest first. Empty if no template is within maxDistance.
+        """
+        if self.tree is None:
+            self.build()
+            if self.tree is None:
+                return []
+        distances, indices = self.tree.query(normalizePose(landmarks), k=k, distance_upper_bound=maxDistance)
+        distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+        return [(self.labels[i], float(d)) for d, i in zip(distances, indices) if np.isfinite(d)]
+
+    def save(self, path):
+        """Save the index to path.npy (vectors) and path.json (labels)."""
+        self.build()
+        # A loaded index is backed by a memory map of path.npy, so copy it into memory and swap in the new
+        # files with os.replace instead of truncating the file that is still mapped. Stored as float64 so
+        # the memory-mapped array can back the tree without conversion.
+        self.vectors = np.array(self.vectors, dtype=float)
+        self.build()
+        with open(path + ".npy.tmp", "wb") as f:
+            np.save(f, self.vectors)
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"labels": self.labels}, f)
+        os.replace(path + ".npy.tmp", path + ".npy")
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with save, memory-mapping the template vectors."""
+        vectors = np.load(path + ".npy", mmap_mode="r")
+        with open(path + ".json") as f:
+            labels = json.load(f)["labels"]
+        index = cls(vectors, labels)
+        index.build()
+        return index
+
+
+def main():
+    """
+    Record template poses from the camera: python PoseTemplates.py <index path> <label>.
+    Press 'r' to record the current pose, 'c' to classify it and 'q' to save and quit.
+    """
+    path, label = sys.argv[1], sys.argv[2]
+    index = PoseIndex.load(path) if os.path.exists(path + ".npy") else PoseIndex()
+    detector = HTM.HandDetector(maxHands=1)
+    cap = openCamera()
+
+    while True:
+        success, img = cap.read()
+        if not success:
+            print("Failed to read from camera.")
+            break
+
+        img = detector.findHands(img, timestamp=cap.get(cv2.CAP_PROP_POS_MSEC))
+        hands = detector.results.multi_hand_landmarks
+        landmarks = landmarkArray(hands[0], img.shape[1], img.shape[0]) if hands else None
+
+        cv2.putText(img, f"{label}: {len(index)} templates", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (255, 0, 255), 2)
+        cv2.imshow("Pose Templates", img)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('r') and landmarks is not None:
+            index.add(landmarks, label)
+        elif key == ord('c') and landmarks is not None:
+            sTime = time.perf_counter()
+            matches = index.classify(landmarks, k=3)
+            print(matches, f"{(time.perf_counter() - sTime) * 1000:.3f} ms")
+        elif key == ord('q'):
+            break
+
+    index.save(path)
+    cap.release()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
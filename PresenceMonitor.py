@@ -0,0 +1,104 @@
+import logging
+import time
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceMonitor:
+    def __init__(self, idleAfter=5.0, idleFps=2, idleScale=0.5):
+        """
+        Duty-cycle a frame loop while no hand is in view.
+        After idleAfter seconds without a hand the loop drops to idleFps and runs detection on frames
+        downscaled by idleScale; the first detected hand switches it back to full rate immediately.
+        Args:
+            idleAfter: Seconds without a detected hand before going idle.
+            idleFps: Detection rate while idle.
+            idleScale: Scale factor applied to frames before inference while idle.
+        """
+        self.idleAfter = idleAfter
+        self.idleInterval = 1 / idleFps
+        self.idleScale = idleScale
+        self.idle = False
+        self.lastHandTime = time.monotonic()
+        self.lastFrameTime = 0
+        # CPU (process) and wall-clock seconds spent in each mode
+        self.cpuTime = {"active": 0.0, "idle": 0.0}
+        self.wallTime = {"active": 0.0, "idle": 0.0}
+        self._cpuMark = time.process_time()
+        self._wallMark = time.monotonic()
+
+    @property
+    def mode(self):
+        return "idle" if self.idle else "active"
+
+    def _account(self):
+        cpu, wall = time.process_time(), time.monotonic()
+        self.cpuTime[self.mode] += cpu - self._cpuMark
+        self.wallTime[self.mode] += wall - self._wallMark
+        self._cpuMark, self._wallMark = cpu, wall
+
+    def waitForNextFrame(self, cap):
+        """
+        While idle, hold the loop to idleFps by sleeping, then grab (without decoding) the frame the driver
+        buffered during the wait, so the next read returns a current frame instead of a stale one.
+        Grabbing continuously instead would spin at full speed on sources that do not block, such as files.
+        """
+        if self.idle:
+            delay = self.lastFrameTime + self.idleInterval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+                cap.grab()
+        self.lastFrameTime = time.monotonic()
+
+    def prepareInput(self, frame, pool=None):
+        """Return the frame to run detection on: downscaled while idle, unchanged otherwise."""
+        if not self.idle:
+            return frame
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * self.idleScale)), max(1, int(h * self.idleScale)))
+        if pool is not None:
+            return pool.resize(frame, size, "idle")
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def detectHands(self, detector, frame, timestamp=None):
+        """
+        Run a HandDetector on the frame, downscaled while idle, and update the mode from the result.
+        Args:
+            detector: HandTrackingModule.HandDetector.
+            frame: The captured frame; landmark positions are given in its coordinates.
+            timestamp: Capture position of the frame in ms, see HandDetector.findHands.
+        Returns:
+            list: Landmark positions of the first hand as [id, x, y], empty if there is none.
+        """
+        detector.findHands(self.prepareInput(frame), draw=False, timestamp=timestamp)
+        lmList = detector.findPosition(frame, draw=False)
+        self.update(len(lmList) > 0)
+        return lmList
+
+    def update(self, handPresent):
+        """Report whether the last detection found a hand. Returns True while idle."""
+        now = time.monotonic()
+        if handPresent:
+            self.lastHandTime = now
+            if self.idle:
+                self._account()
+                self.idle = False
+                logger.info("Hand detected, back to full rate")
+        elif not self.idle and now - self.lastHandTime >= self.idleAfter:
+            self._account()
+            self.idle = True
+            logger.info("No hand for %.0f s, dropping to %.0f fps", self.idleAfter, 1 / self.idleInterval)
+        return self.idle
+
+    def report(self):
+        """Return CPU and wall-clock seconds per mode and the CPU utilization of each."""
+        self._account()
+        return {mode: {"cpu": self.cpuTime[mode], "wall": self.wallTime[mode],
+                       "utilization": self.cpuTime[mode] / self.wallTime[mode] if self.wallTime[mode] else 0}
+                for mode in ("active", "idle")}
+
+    def summary(self):
+        report = self.report()
+        return ", ".join(f"{mode}: {values['cpu']:.1f} s CPU over {values['wall']:.1f} s "
+                         f"({values['utilization']:.0%})" for mode, values in report.items())
@@ -0,0 +1,171 @@
+import cProfile
+import contextlib
+import io
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Returned by FrameProfiler.stage while no capture is running, so disabled stages cost one call
+_NO_STAGE = contextlib.nullcontext()
+
+
+class _StageTimer:
+    def __init__(self, times):
+        self.times = times
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.times.append(time.perf_counter() - self.start)
+
+
+class FrameProfiler:
+    def __init__(self, duration=10, outputDir="profiles", sampleInterval=0.005, hotkey='p', startNow=False):
+        """
+        Time-boxed profiling of a frame loop, started from an environment variable or a hotkey.
+        A capture records a cProfile profile, a sampling profile of the loop's thread, tracemalloc top
+        allocations and per-stage timings, and writes them to a timestamped directory under outputDir.
+        Args:
+            duration: Length of a capture in seconds.
+            outputDir: Directory receiving one subdirectory per capture.
+            sampleInterval: Seconds between samples of the sampling profiler.
+            hotkey: Key that starts (or stops early) a capture, see handleKey.
+            startNow: Start a capture at the next frame.
+        """
+        self.duration = duration
+        self.outputDir = outputDir
+        self.sampleInterval = sampleInterval
+        self.hotkey = ord(hotkey)
+        self.pendingStart = startNow
+        self.active = False
+
+    @classmethod
+    def fromEnv(cls, **kwargs):
+        """
+        Create a profiler configured from the environment. SELINSEV_PROFILE=<seconds> starts a capture of
+        that length at the first frame (other values start one of the default length); SELINSEV_PROFILE_DIR
+        sets the output directory.
+        """
+        seconds = os.environ.get("SELINSEV_PROFILE")
+        if seconds:
+            try:
+                duration = float(seconds)
+            except ValueError:
+                duration = None
+            if duration is not None and 0 < duration < float("inf"):
+                kwargs.setdefault("duration", duration)
+            else:
+                logger.warning("SELINSEV_PROFILE=%r is not a positive number of seconds, profiling for the "
+                               "default duration", seconds)
+            kwargs["startNow"] = True
+        if os.environ.get("SELINSEV_PROFILE_DIR"):
+            kwargs.setdefault("outputDir", os.environ["SELINSEV_PROFILE_DIR"])
+        return cls(**kwargs)
+
+    def handleKey(self, key):
+        """Pass the cv2.waitKey result; the hotkey starts a capture, or stops the running one."""
+        if key == self.hotkey:
+            if self.active:
+                self.stop()
+            else:
+                self.pendingStart = True
+
+    def frameStart(self):
+        if self.pendingStart:
+            self.pendingStart = False
+            self.start()
+        if self.active:
+            self.frameStartTime = time.perf_counter()
+
+    def frameEnd(self, key=None):
+        """End the frame; key is the frame's cv2.waitKey result, passed on to handleKey."""
+        if self.active:
+            now = time.perf_counter()
+            self.stageTimes["frame"].append(now - self.frameStartTime)
+            if now - self.startTime >= self.duration:
+                self.stop()
+        if key is not None:
+            self.handleKey(key)
+
+    def close(self):
+        """Stop a running capture, writing its output. Call when the frame loop exits."""
+        if self.active:
+            self.stop()
+
+    def stage(self, name):
+        """Context manager timing one stage of the frame, e.g. with profiler.stage("inference"): ..."""
+        if not self.active:
+            return _NO_STAGE
+        return _StageTimer(self.stageTimes[name])
+
+    def start(self):
+        self.stageTimes = defaultdict(list)
+        self.stacks = Counter()
+        self.startTime = time.perf_counter()
+        # Created now with a unique suffix: a capture stopped early and restarted within the same second must not
+        # write into the previous one's directory
+        os.makedirs(self.outputDir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=self.outputDir)
+        tracemalloc.start(25)
+        self.profile = cProfile.Profile()
+        self.samplerStop = threading.Event()
+        self.sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+        self.sampler.start()
+        self.profile.enable()
+        self.active = True
+        print(f"Profiling for {self.duration:.0f} s...")
+
+    def stop(self):
+        self.profile.disable()
+        self.active = False
+        self.samplerStop.set()
+        self.sampler.join()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self._write(snapshot)
+        print(f"Profile written to {self.directory}")
+
+    def _sample(self, threadId):
+        while not self.samplerStop.wait(self.sampleInterval):
+            frame = sys._current_frames().get(threadId)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def _write(self, snapshot):
+        # pstats: load with pstats.Stats or snakeviz; profile.txt is a readable summary
+        self.profile.dump_stats(os.path.join(self.directory, "profile.pstats"))
+        summary = io.StringIO()
+        pstats.Stats(self.profile, stream=summary).sort_stats("cumulative").print_stats(50)
+        with open(os.path.join(self.directory, "profile.txt"), "w") as f:
+            f.write(summary.getvalue())
+
+        # Collapsed stacks, the input format of flamegraph.pl and speedscope
+        with open(os.path.join(self.directory, "stacks.folded"), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with open(os.path.join(self.directory, "tracemalloc.txt"), "w") as f:
+            for stat in snapshot.statistics("lineno")[:30]:
+                f.write(f"{stat}\n")
+
+        with open(os.path.join(self.directory, "stages.csv"), "w") as f:
+            f.write("stage,count,mean_ms,p95_ms,max_ms\n")
+            for name, times in self.stageTimes.items():
+                ordered = sorted(times)
+                p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+                f.write(f"{name},{len(times)},{sum(times) / len(times) * 1000:.3f},{p95 * 1000:.3f},"
+                        f"{ordered[-1] * 1000:.3f}\n")
@@ -1,36 +1,51 @@
+import math
 import cv2
-import mediapipe as mp
-import numpy as np
+from LandmarkBackends import HandLandmark, createBackend
+
+TOUCH_THRESHOLD = 0.05  # Threshold for determining whether fingers are touching
+OPEN_THRESHOLD = 0.15  # Distance threshold for determining if a finger is open
 
 
 class Sense:
 
-    def __init__(self):
-        # Initialize the Mediapipe Hands object to track hand landmarks
-        self.mp_hands = mp.solutions.hands.Hands()
+    def __init__(self, backend=None):
+        # Landmark backend used by process(); created on first use when not given
+        self.backend = backend
+
+    def process(self, image, timestamp=None):
+        """Run the landmark backend on an RGB image, captured at timestamp (ms), and return its results."""
+        if self.backend is None:
+            self.backend = createBackend()
+        return self.backend.process(image, timestamp)
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
 
     def _get_landmarks(self, landmarks):
         """Helper function to retrieve relevant landmarks for fingers and thumb."""
         return {
-            "thumb_tip": landmarks.landmark[mp.solutions.hands.HandLandmark.THUMB_TIP],
-            "index_tip": landmarks.landmark[mp.solutions.hands.HandLandmark.INDEX_FINGER_TIP],
-            "middle_tip": landmarks.landmark[mp.solutions.hands.HandLandmark.MIDDLE_FINGER_TIP],
-            "ring_tip": landmarks.landmark[mp.solutions.hands.HandLandmark.RING_FINGER_TIP],
-            "pinky_tip": landmarks.landmark[mp.solutions.hands.HandLandmark.PINKY_TIP],
-            "index_mcp": landmarks.landmark[mp.solutions.hands.HandLandmark.INDEX_FINGER_MCP],
-            "middle_mcp": landmarks.landmark[mp.solutions.hands.HandLandmark.MIDDLE_FINGER_MCP],
-            "ring_mcp": landmarks.landmark[mp.solutions.hands.HandLandmark.RING_FINGER_MCP],
-            "pinky_mcp": landmarks.landmark[mp.solutions.hands.HandLandmark.PINKY_MCP]
+            "thumb_tip": landmarks.landmark[HandLandmark.THUMB_TIP],
+            "index_tip": landmarks.landmark[HandLandmark.INDEX_FINGER_TIP],
+            "middle_tip": landmarks.landmark[HandLandmark.MIDDLE_FINGER_TIP],
+            "ring_tip": landmarks.landmark[HandLandmark.RING_FINGER_TIP],
+            "pinky_tip": landmarks.landmark[HandLandmark.PINKY_TIP],
+            "index_mcp": landmarks.landmark[HandLandmark.INDEX_FINGER_MCP],
+            "middle_mcp": landmarks.landmark[HandLandmark.MIDDLE_FINGER_MCP],
+            "ring_mcp": landmarks.landmark[HandLandmark.RING_FINGER_MCP],
+            "pinky_mcp": landmarks.landmark[HandLandmark.PINKY_MCP]
         }
 
     def _calculate_distance(self, point1, point2):
         """Helper function to compute the Euclidean distance between two points."""
-        return np.linalg.norm(np.array([point1.x - point2.x, point1.y - point2.y]))
+        dx = point1.x - point2.x
+        dy = point1.y - point2.y
+        return math.sqrt(dx * dx + dy * dy)
 
     def extract_finger_touch(self, landmarks):
         """Check if each finger touches the thumb."""
         points = self._get_landmarks(landmarks)
-        threshold = 0.05  # Threshold for determining whether fingers are touching
+        threshold = TOUCH_THRESHOLD
 
         return {
             "thumb_to_index": self._calculate_distance(points["thumb_tip"], points["index_tip"]) < threshold,
@@ -42,7 +57,7 @@ class Sense:
     def extract_finger_open_close(self, landmarks):
         """Detect if fingers are open or closed."""
         points = self._get_landmarks(landmarks)
-        open_threshold = 0.15  # Distance threshold for determining if a finger is open
+        open_threshold = OPEN_THRESHOLD
 
         # Check for each finger if the distance between the tip and MCP is greater than the threshold
         return {
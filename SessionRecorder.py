@@ -0,0 +1,147 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRecorder:
+    def __init__(self, outputDir="recordings", size=None, fps=15, fourcc="mp4v", extension=".mp4",
+                 queueSize=30):
+        """
+        Record session video on a background thread.
+        The frame loop only copies a frame into a bounded queue; resizing and encoding with cv2.VideoWriter
+        happen on the writer thread. When the writer falls behind, the oldest queued frame is dropped.
+        Frames are placed by their capture time: gaps (idle duty cycling, dropped frames) are filled by repeating
+        the previous frame, so recordings play back in real time. Each exercise goes to its own file, see rotate.
+        Args:
+            outputDir: Directory receiving the recordings.
+            size: Recorded (width, height); frames are resized to it. None keeps the size of each file's first frame.
+            fps: Recorded frame rate. Frames submitted faster than this are skipped before being copied.
+            fourcc: Codec of the cv2.VideoWriter.
+            extension: File extension matching the codec's container.
+            queueSize: Maximum number of frames waiting to be encoded.
+        """
+        self.outputDir = outputDir
+        self.size = tuple(size) if size is not None else None
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.extension = extension
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.queue = deque(maxlen=queueSize)
+        self.condition = threading.Condition()
+        self.fileName = "000_session"
+        self.rotations = 0
+        self.nextDue = 0.0
+        self.stopping = False
+        self.submitted = 0  # Frames queued
+        self.skipped = 0  # Frames above the recording frame rate, never queued
+        self.dropped = 0  # Queued frames discarded because the writer fell behind
+        self.written = 0  # Frames encoded
+        self.repeated = 0  # Extra copies of frames encoded to fill gaps between capture times
+        self.files = []
+        self.thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def fromEnv(cls, **kwargs):
+        """Create a recorder writing to $SELINSEV_RECORD_DIR, or return None if it is not set."""
+        outputDir = os.environ.get("SELINSEV_RECORD_DIR")
+        if not outputDir:
+            return None
+        return cls(outputDir, **kwargs)
+
+    def rotate(self, name):
+        """Send the frames submitted from now on to a new file named after the exercise."""
+        with self.condition:
+            # Numbered, so that repeating an exercise starts a new file instead of appending to or replacing one
+            self.rotations += 1
+            self.fileName = f"{self.rotations:03d}_" + re.sub(r"[^\w.-]+", "_", name)
+
+    def submit(self, frame, timestamp=None):
+        """
+        Queue a frame (annotated or raw) for recording. The frame is copied, since capture buffers are reused.
+        Args:
+            frame: BGR frame.
+            timestamp: Capture time in seconds on the time.perf_counter clock; defaults to now.
+        Returns:
+            bool: False if the frame was skipped to keep to the recording frame rate.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        if timestamp < self.nextDue:
+            self.skipped += 1
+            return False
+        # Advance on a fixed schedule so a loop running faster than fps still averages fps
+        self.nextDue = max(self.nextDue + 1 / self.fps, timestamp)
+        copy = frame.copy()
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1  # The append below pushes out the oldest frame
+            self.queue.append((self.fileName, timestamp, copy))
+            self.submitted += 1
+            self.condition.notify()
+        return True
+
+    def _open(self, name, size):
+        os.makedirs(self.outputDir, exist_ok=True)
+        path = os.path.join(self.outputDir, f"{self.session}_{name}{self.extension}")
+        # A session started within the same second must not overwrite the previous one's files
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(self.outputDir, f"{self.session}_{name}-{suffix}{self.extension}")
+        writer = cv2.VideoWriter(path, self.fourcc, self.fps, size)
+        if not writer.isOpened():
+            logger.error("Could not open %s for recording", path)
+        self.files.append(path)
+        logger.info("Recording to %s", path)
+        return writer
+
+    def _run(self):
+        writer, writerName, size = None, None, None
+        start, position, previous = 0.0, 0, None  # First capture time, next frame index and last frame of the file
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopping:
+                    self.condition.wait()
+                if not self.queue:
+                    break
+                name, timestamp, frame = self.queue.popleft()
+
+            if name != writerName:
+                if writer is not None:
+                    writer.release()
+                size = self.size or (frame.shape[1], frame.shape[0])
+                writer, writerName = self._open(name, size), name
+                start, position, previous = timestamp, 0, None
+            if (frame.shape[1], frame.shape[0]) != size:
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            # Repeat the previous frame until this one's capture time, so skipped time is not cut out
+            due = int(round((timestamp - start) * self.fps))
+            while previous is not None and position < due:
+                writer.write(previous)
+                position += 1
+                self.repeated += 1
+            writer.write(frame)
+            position += 1
+            previous = frame
+            self.written += 1
+
+        if writer is not None:
+            writer.release()
+
+    def close(self):
+        """Encode the frames still queued, then close the current file."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
+
+    def report(self):
+        return (f"Recording: {self.written} frames written to {len(self.files)} files ({self.repeated} repeated to "
+                f"keep real time), {self.dropped} dropped, {self.skipped} skipped above {self.fps} fps")
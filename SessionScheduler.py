@@ -0,0 +1,104 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def loadPlan(path):
+    """
+    Load a session plan and flatten it into the ordered list of exercises.
+    Args:
+        path: Path to a JSON file of the form
+              {"levels": [{"name": ..., "description": ..., "exercises": [{"type": ..., "repetitions": ...}]}]}.
+              Any other exercise fields (thresholds, instruction, ...) are passed to the exercise factory.
+    Returns:
+        list: Exercise specs, each extended with "level", "levelName", "levelDescription" and
+              "exercise" (1-based index within its level).
+    """
+    with open(path) as f:
+        plan = json.load(f)
+
+    exercises = []
+    for levelIndex, level in enumerate(plan["levels"]):
+        for exerciseIndex, spec in enumerate(level["exercises"]):
+            exercises.append({
+                **spec,
+                "level": levelIndex + 1,
+                "levelName": level.get("name", f"Level {levelIndex + 1}"),
+                "levelDescription": level.get("description", ""),
+                "exercise": exerciseIndex + 1,
+            })
+    return exercises
+
+
+class SessionScheduler:
+    def __init__(self, exercises, factories):
+        """
+        Run a session plan, preparing the next exercise in the background while the current one runs.
+        Args:
+            exercises: Exercise specs as returned by loadPlan.
+            factories: Dict mapping an exercise "type" to a function that takes the spec and returns
+                       the prepared exercise state (detector, assets, ...).
+        """
+        self.exercises = exercises
+        self.factories = factories
+        self.index = -1
+        self.current = None  # Prepared state of the current exercise
+        self.switchWait = 0  # Seconds the last switch waited for its exercise to be prepared
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # The first exercise is prepared right away, while the user is still on the start screen
+        self._next = self._prepare(0)
+
+    @property
+    def spec(self):
+        """Spec of the current exercise, or None before the start and after the last exercise."""
+        if 0 <= self.index < len(self.exercises):
+            return self.exercises[self.index]
+        return None
+
+    def _prepare(self, index):
+        if index >= len(self.exercises):
+            return None
+        spec = self.exercises[index]
+        return self._executor.submit(self.factories[spec["type"]], spec)
+
+    def start(self):
+        """Start the session from the first exercise. Returns its spec."""
+        if self.index != -1:
+            self.index = -1
+            self._next = self._prepare(0)
+        return self.advance()
+
+    def advance(self):
+        """
+        Switch to the next exercise and start preparing the one after it.
+        Returns:
+            dict: Spec of the new current exercise, or None if the session is complete.
+        Raises:
+            Exception: Whatever the exercise's factory raised; the session stays on the current exercise.
+        """
+        self.index += 1
+        if self.index >= len(self.exercises):
+            self.current = None
+            return None
+
+        sTime = time.perf_counter()
+        future = self._next if self._next is not None else self._prepare(self.index)
+        try:
+            self.current = future.result()
+        except Exception:
+            # Step back so that the next call prepares this exercise again instead of skipping it
+            self.index -= 1
+            self._next = None
+            raise
+        self.switchWait = time.perf_counter() - sTime
+        logger.info("Exercise %d/%d (%s) ready after %.1f ms wait", self.index + 1, len(self.exercises),
+                    self.spec["type"], self.switchWait * 1000)
+
+        self._next = self._prepare(self.index + 1)
+        return self.spec
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,329 @@
+import argparse
+import math
+import multiprocessing as mproc
+import queue
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+import HandTrackingModule as HTM
+
+
+class SharedFrameRing:
+    def __init__(self, shape, slots=4, name=None):
+        """
+        Ring of preallocated frame slots in shared memory, plus a capture timestamp and position per slot.
+        Args:
+            shape: Frame shape (height, width, channels).
+            slots: Number of frame slots.
+            name: Name of an existing ring to attach to. If None, a new ring is created.
+        """
+        self.shape = tuple(shape)
+        self.slots = slots
+        frameBytes = math.prod(self.shape)
+        size = slots * frameBytes + slots * 16
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.timestamps = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf, offset=slots * frameBytes)
+        # CAP_PROP_POS_MSEC of each frame, which replaying landmark backends follow
+        self.positions = np.ndarray((slots,), dtype=np.float64, buffer=self.shm.buf,
+                                    offset=slots * frameBytes + slots * 8)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        # The numpy views must be released before the shared memory can be closed
+        del self.frames, self.timestamps, self.positions
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def openCapture(source, properties=()):
+    """Open a cv2.VideoCapture and apply (property, value) pairs to it, in order."""
+    cap = cv2.VideoCapture(source)
+    for prop, value in properties:
+        cap.set(prop, value)
+    return cap
+
+
+def captureProcess(ringName, shape, slots, source, free, ready, dropped, maxFrames, dropWhenFull, properties=()):
+    """
+    Capture frames straight into free ring slots and announce them as (slot, sequence number).
+    Args:
+        ringName, shape, slots: Ring to attach to.
+        source: Camera index or video file path.
+        free: Queue of slot indices the capture process may write to.
+        ready: Queue receiving (slot, sequence) of captured frames, and None at the end.
+        dropped: Shared counter of frames dropped because no slot was free.
+        maxFrames: Number of frames to capture, or None for no limit.
+        dropWhenFull: Drop frames when the consumer is behind (live camera) instead of waiting (video file).
+        properties: (property, value) pairs set on the capture before reading, see openCapture.
+    """
+    ring = SharedFrameRing(shape, slots, ringName)
+    cap = openCapture(source, properties)
+    sequence = 0
+    target = frame = None
+    try:
+        while maxFrames is None or sequence < maxFrames:
+            try:
+                slot = free.get_nowait() if dropWhenFull else free.get()
+            except queue.Empty:
+                # Consumer is behind: take the frame off the camera and discard it
+                if not cap.grab():
+                    break
+                with dropped.get_lock():
+                    dropped.value += 1
+                continue
+
+            target = ring.frames[slot]
+            success, frame = cap.read(image=target)
+            if not success:
+                break
+            if frame is not target:
+                # The backend returned a new buffer instead of filling ours
+                np.copyto(target, frame)
+            ring.timestamps[slot] = time.monotonic_ns()
+            ring.positions[slot] = cap.get(cv2.CAP_PROP_POS_MSEC)
+            ready.put((slot, sequence))
+            sequence += 1
+    finally:
+        ready.put(None)
+        cap.release()
+        # Views into the ring must be dropped before it can be closed
+        target = frame = None
+        ring.close()
+
+
+def probeCapture(source, properties=()):
+    """
+    Open a capture with the given properties and read one frame.
+    Returns:
+        tuple: (frame shape, {property: value the device accepted} for the requested properties).
+    """
+    cap = openCapture(source, properties)
+    success, frame = cap.read()
+    settings = {prop: cap.get(prop) for prop, _ in properties}
+    cap.release()
+    if not success:
+        raise RuntimeError(f"Could not read a frame from {source}")
+    return frame.shape, settings
+
+
+class SharedCapture:
+    def __init__(self, source=0, slots=4, timeout=5.0):
+        """
+        A capture running in a separate process, handing frames over through a SharedFrameRing, behind the
+        cv2.VideoCapture interface. Camera uses it as its device when $SELINSEV_CAPTURE=shared (see
+        CameraManager.open), so decoding overlaps with inference in every loop that opens the camera.
+        Frames are copied out of their slot into the caller's buffer, so the slot is free for the next capture.
+        Live cameras are read newest first: frames that queued up while the loop was busy are dropped.
+        Mode changes restart the capture process on the next read; until then get returns the requested value.
+        Args:
+            source: Camera index (an int or a string of digits) or video file path.
+            slots: Number of ring slots.
+            timeout: Seconds to wait for a frame before a read fails.
+        """
+        self.source = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.slots = slots
+        self.timeout = timeout
+        self.live = isinstance(self.source, int)
+        self.properties = {}  # Requested with set, applied by the capture process
+        self.settings = {}  # What the device accepted at the last start
+        self.dropped = mproc.Value("q", 0)  # Frames not delivered because the loop was behind
+        self.ring = self.process = self.free = self.ready = None
+        self.current = None  # Slot of the last grabbed frame, returned to the ring on the next grab
+        self.restart = True
+        self.ended = False
+
+    def isOpened(self):
+        return not self.ended
+
+    def set(self, prop, value):
+        self.properties[prop] = value
+        self.restart = True
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return float(self.ring.positions[self.current]) if self.current is not None else 0.0
+        if not self.restart and prop in self.settings:
+            return self.settings[prop]
+        return self.properties.get(prop, 0.0)
+
+    def _start(self):
+        self._stop()
+        properties = list(self.properties.items())
+        try:
+            shape, self.settings = probeCapture(self.source, properties)
+        except RuntimeError:
+            self.ended = True
+            return False
+        self.ring = SharedFrameRing(shape, self.slots)
+        self.free, self.ready = mproc.Queue(), mproc.Queue()
+        for slot in range(self.slots):
+            self.free.put(slot)
+        self.process = mproc.Process(target=captureProcess,
+                                     args=(self.ring.name, shape, self.slots, self.source, self.free, self.ready,
+                                           self.dropped, None, self.live, properties),
+                                     daemon=True)
+        self.process.start()
+        self.restart = False
+        return True
+
+    def _stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        self.current = None
+
+    def grab(self):
+        if self.ended or (self.restart and not self._start()):
+            return False
+        if self.current is not None:
+            self.free.put(self.current)
+            self.current = None
+        try:
+            item = self.ready.get(timeout=self.timeout)
+        except queue.Empty:
+            item = None
+        if self.live:
+            # Skip to the newest frame; the older ones are stale by now
+            while item is not None:
+                try:
+                    newer = self.ready.get_nowait()
+                except queue.Empty:
+                    break
+                self.free.put(item[0])
+                with self.dropped.get_lock():
+                    self.dropped.value += 1
+                item = newer
+        if item is None:
+            self.ended = True
+            return False
+        self.current = item[0]
+        return True
+
+    def retrieve(self, image=None):
+        if self.current is None:
+            return False, None
+        frame = self.ring.frames[self.current]
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self._stop()
+        self.ended = True
+
+
+def runMultiProcess(source=0, slots=4, maxFrames=None, show=True, modelComplexity=1):
+    """
+    Run capture in a separate process and landmark inference in this one, passing frames through shared memory.
+    Returns:
+        dict: Frames processed, throughput, latency statistics (capture to processed) and dropped frames.
+    """
+    shape, _ = probeCapture(source)
+    ring = SharedFrameRing(shape, slots)
+    free, ready = mproc.Queue(), mproc.Queue()
+    for slot in range(slots):
+        free.put(slot)
+    dropped = mproc.Value("q", 0)
+    capture = mproc.Process(target=captureProcess,
+                            args=(ring.name, shape, slots, source, free, ready, dropped, maxFrames,
+                                  isinstance(source, int)),
+                            daemon=True)
+    capture.start()
+
+    detector = HTM.HandDetector(modelComplexity=modelComplexity)
+    latencies = []
+    frame = None
+    sTime = time.perf_counter()
+    try:
+        while True:
+            item = ready.get()
+            if item is None:
+                break
+            slot, sequence = item
+            frame = ring.frames[slot]  # Zero-copy view of the slot
+            detector.findHands(frame, draw=show)
+            latencies.append((time.monotonic_ns() - ring.timestamps[slot]) / 1e6)
+            if show:
+                cv2.imshow("Shared Memory Capture", frame)
+            free.put(slot)
+            if show and cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        elapsed = time.perf_counter() - sTime
+        capture.terminate()
+        capture.join()
+        frame = None
+        ring.close()
+        if show:
+            cv2.destroyAllWindows()
+    return summarize("multi-process", latencies, elapsed, dropped.value)
+
+
+def runSingleProcess(source=0, maxFrames=None, modelComplexity=1):
+    """Reference loop: capture, conversion and inference in one process."""
+    cap = cv2.VideoCapture(source)
+    detector = HTM.HandDetector(modelComplexity=modelComplexity)
+    latencies = []
+    sTime = time.perf_counter()
+    while maxFrames is None or len(latencies) < maxFrames:
+        success, frame = cap.read()
+        if not success:
+            break
+        captured = time.monotonic_ns()
+        detector.findHands(frame, draw=False)
+        latencies.append((time.monotonic_ns() - captured) / 1e6)
+    elapsed = time.perf_counter() - sTime
+    cap.release()
+    return summarize("single-process", latencies, elapsed, 0)
+
+
+def summarize(mode, latencies, elapsed, dropped):
+    report = {
+        "mode": mode,
+        "frames": len(latencies),
+        "fps": len(latencies) / elapsed if elapsed else 0,
+        "latencyMeanMs": float(np.mean(latencies)) if latencies else 0,
+        "latencyP95Ms": float(np.percentile(latencies, 95)) if latencies else 0,
+        "dropped": dropped,
+    }
+    print(f"{mode}: {report['frames']} frames, {report['fps']:.1f} fps, latency mean {report['latencyMeanMs']:.1f} ms, "
+          f"p95 {report['latencyP95Ms']:.1f} ms, {dropped} dropped")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shared-memory capture against the single-process loop.")
+    parser.add_argument("--source", default="0", help="Camera index or video file")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--show", action="store_true", help="Run the multi-process mode with a preview window")
+    args = parser.parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    if args.show:
+        runMultiProcess(source, args.slots)
+        return
+    runSingleProcess(source, args.frames)
+    runMultiProcess(source, args.slots, args.frames, show=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import math
+import time
+from collections import deque
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import HandTrackingModule as HTM
+from CameraManager import openCamera
+
+
+def normalizeTrajectory(path, length):
+    """
+    Resample a trajectory to a fixed number of points and normalize its position and size.
+    Args:
+        path: Array of shape (L, D) of positions over time.
+        length: Number of points of the result.
+    Returns:
+        np.ndarray: Array of shape (length, D), centred on zero with unit RMS distance from the centre.
+    """
+    path = np.asarray(path, dtype=float)
+    source = np.linspace(0, 1, len(path))
+    target = np.linspace(0, 1, length)
+    resampled = np.stack([np.interp(target, source, path[:, d]) for d in range(path.shape[1])], axis=1)
+    resampled -= resampled.mean(axis=0)
+    scale = math.sqrt((resampled ** 2).sum(axis=1).mean())
+    return resampled / max(scale, 1e-9)
+
+
+def envelope(series, window):
+    """Return the upper and lower LB_Keogh envelopes of a (L, D) series for a warping window."""
+    padded = np.pad(series, ((window, window), (0, 0)), mode="edge")
+    windows = sliding_window_view(padded, 2 * window + 1, axis=0)  # (L, D, 2 * window + 1)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+
+def dtwDistance(a, b, window, bestSoFar=math.inf):
+    """
+    Squared-Euclidean dynamic time warping distance between two equally long series,
+    constrained to a Sakoe-Chiba band.
+    Args:
+        a, b: Arrays of shape (L, D).
+        window: Maximum index offset of the warping path.
+        bestSoFar: Computation is abandoned as soon as the distance is certain to exceed this.
+    Returns:
+        float: The DTW distance, or math.inf if abandoned.
+    """
+    n = len(a)
+    cost = ((a[:, np.newaxis, :] - b[np.newaxis, :, :]) ** 2).sum(axis=-1).tolist()
+    previous = [math.inf] * (n + 1)
+    previous[0] = 0.0
+    for i in range(1, n + 1):
+        current = [math.inf] * (n + 1)
+        row = cost[i - 1]
+        rowMin = math.inf
+        for j in range(max(1, i - window), min(n, i + window) + 1):
+            best = previous[j - 1]
+            if previous[j] < best:
+                best = previous[j]
+            if current[j - 1] < best:
+                best = current[j - 1]
+            value = row[j - 1] + best
+            current[j] = value
+            if value < rowMin:
+                rowMin = value
+        # Every warping path crosses this row, so the distance is at least its minimum
+        if rowMin > bestSoFar:
+            return math.inf
+        previous = current
+    return previous[n]
+
+
+def circleTrajectory(length=64):
+    angles = np.linspace(0, 2 * np.pi, length)
+    return np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+
+def waveTrajectory(length=64, cycles=2):
+    t = np.linspace(0, 1, length)
+    return np.stack([np.sin(2 * np.pi * cycles * t), np.zeros(length)], axis=1)
+
+
+class TrajectoryMatcher:
+    def __init__(self, length=32, window=0.1, maxPoints=60, scale=0.5, minExtent=0.0):
+        """
+        Match the recent path of a landmark against a library of reference trajectories.
+        Args:
+            length: Number of points trajectories are resampled to before matching.
+            window: Warping window as a fraction of length.
+            maxPoints: Number of recent positions kept as the live path.
+            scale: RMS point distance at which the similarity score drops to 1/e.
+            minExtent: Smallest x or y range, in path units, of a path that is matched. Normalization scales
+                any path to the same size, so without it a few pixels of tremor of a still hand match like a wave.
+        """
+        self.length = length
+        self.window = max(1, int(round(window * length)))
+        self.scale = scale
+        self.minExtent = minExtent
+        self.path = deque(maxlen=maxPoints)
+        self.names = []
+        self.references = np.empty((0, length, 2))
+        self.upper = np.empty((0, length, 2))
+        self.lower = np.empty((0, length, 2))
+        # Statistics of the last match: references pruned by the lower bound, abandoned early, fully computed
+        self.pruned = self.abandoned = self.computed = 0
+
+    def addReference(self, name, path):
+        """Add a reference trajectory, an array of shape (L, 2) of positions over time."""
+        reference = normalizeTrajectory(path, self.length)
+        upper, lower = envelope(reference, self.window)
+        self.names.append(name)
+        self.references = np.concatenate([self.references, reference[np.newaxis]])
+        self.upper = np.concatenate([self.upper, upper[np.newaxis]])
+        self.lower = np.concatenate([self.lower, lower[np.newaxis]])
+
+    def update(self, point):
+        """Append the latest landmark position (x, y) to the live path."""
+        self.path.append(point)
+
+    def similarity(self, distance):
+        """Convert a DTW distance into a score from 0.0 (unrelated) to 1.0 (identical)."""
+        return math.exp(-math.sqrt(distance / self.length) / self.scale)
+
+    def match(self, path=None):
+        """
+        Find the reference trajectory closest to a path.
+        Args:
+            path: Array of shape (L, 2). Defaults to the live path.
+        Returns:
+            tuple: (name, distance, similarity) of the best reference, or None if there is nothing to match
+                or the path is smaller than minExtent.
+        """
+        path = list(self.path) if path is None else path
+        if len(path) < 2 or not self.names:
+            return None
+        extent = np.ptp(np.asarray(path, dtype=float), axis=0).max()
+        if extent < self.minExtent:
+            return None
+        query = normalizeTrajectory(path, self.length)
+
+        # LB_Keogh: squared distance of the query to each reference's envelope, a lower bound on the DTW distance
+        above = np.maximum(query - self.upper, 0)
+        below = np.maximum(self.lower - query, 0)
+        bounds = (above ** 2 + below ** 2).sum(axis=(1, 2))
+
+        self.pruned = self.abandoned = self.computed = 0
+        best, bestIndex = math.inf, None
+        for rank, index in enumerate(np.argsort(bounds)):
+            if bounds[index] >= best:
+                # Candidates are visited in order of their bound, so none of the rest can win either
+                self.pruned = len(bounds) - rank
+                break
+            distance = dtwDistance(query, self.references[index], self.window, best)
+            if distance == math.inf:
+                self.abandoned += 1
+            else:
+                self.computed += 1
+            if distance < best:
+                best, bestIndex = distance, index
+
+        if bestIndex is None:
+            return None
+        return self.names[bestIndex], best, self.similarity(best)
+
+
+def main():
+    cap = openCamera()
+    # Gestures smaller than a tenth of the frame height are treated as a still hand
+    matcher = TrajectoryMatcher(minExtent=0.1 * cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    matcher.addReference("Circle", circleTrajectory())
+    matcher.addReference("Wave", waveTrajectory())
+    matcher.addReference("Slow Wave", waveTrajectory(cycles=1))
+
+    detector = HTM.HandDetector(maxHands=1)
+
+    while True:
+        success, img = cap.read()
+        if not success:
+            print("Failed to read from camera.")
+            break
+
+        img = detector.findHands(img, timestamp=cap.get(cv2.CAP_PROP_POS_MSEC))
+        lmList = detector.findPosition(img, draw=False)
+        if len(lmList) != 0:
+            # Follow the index finger tip (landmark 8)
+            matcher.update(lmList[8][1:3])
+
+        sTime = time.perf_counter()
+        match = matcher.match()
+        matchTime = (time.perf_counter() - sTime) * 1000
+        if match is not None:
+            name, distance, similarity = match
+            cv2.putText(img, f"{name}: {similarity:.0%}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        cv2.putText(img, f"Match: {matchTime:.1f} ms", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
+
+        cv2.imshow("Trajectory Matching", img)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+
+class StubBackend:
+    """In-memory volume backend for tests and machines without audio control."""
+
+    name = "stub"
+
+    def __init__(self):
+        self.level = None
+        self.calls = []  # Every level set, in order
+
+    def setVolume(self, level):
+        self.level = level
+        self.calls.append(level)
+
+
+class PycawBackend:
+    """Windows master volume through pycaw/comtypes."""
+
+    name = "pycaw"
+
+    def __init__(self):
+        # Imported here so the module can be used on platforms without pycaw
+        from comtypes import CLSCTX_ALL
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        self.volume = interface.QueryInterface(IAudioEndpointVolume)
+
+    def setVolume(self, level):
+        self.volume.SetMasterVolumeLevelScalar(level, None)
+
+
+class CommandBackend:
+    """Linux master volume through a mixer command line tool."""
+
+    def __init__(self, name, command):
+        """
+        Args:
+            name: Backend name.
+            command: Command template, with {percent} replaced by the volume in percent.
+        """
+        self.name = name
+        self.command = command
+
+    def setVolume(self, level):
+        args = [arg.format(percent=int(round(level * 100))) for arg in self.command]
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+
+def PulseAudioBackend():
+    return CommandBackend("pulseaudio", ["pactl", "set-sink-volume", "@DEFAULT_SINK@", "{percent}%"])
+
+
+def AlsaBackend():
+    return CommandBackend("alsa", ["amixer", "-q", "sset", "Master", "{percent}%"])
+
+
+BACKENDS = {
+    "pycaw": PycawBackend,
+    "pulseaudio": PulseAudioBackend,
+    "alsa": AlsaBackend,
+    "stub": StubBackend,
+}
+
+
+def createBackend(name=None):
+    """
+    Create a volume backend by name, or pick the first one available on this platform.
+    Args:
+        name: One of BACKENDS, or None to auto-detect.
+    Returns:
+        A backend object with a setVolume(level) method taking a level from 0.0 to 1.0.
+    """
+    if name is not None:
+        return BACKENDS[name]()
+    if sys.platform == "win32":
+        return PycawBackend()
+    if shutil.which("pactl"):
+        return PulseAudioBackend()
+    if shutil.which("amixer"):
+        return AlsaBackend()
+    print("No volume control available, using the stub backend.")
+    return StubBackend()
+
+
+class VolumeController:
+    def __init__(self, backend, deadband=0.02, maxRate=20, smoothing=0.5):
+        """
+        Drive a volume backend from a worker thread, so the frame loop only hands over a target level.
+        Args:
+            backend: Volume backend (see createBackend).
+            deadband: Minimum change of the level (0.0 to 1.0) that is sent to the backend.
+            maxRate: Maximum number of backend calls per second.
+            smoothing: Fraction of the remaining distance to the target covered per update.
+        """
+        self.backend = backend
+        self.deadband = deadband
+        self.interval = 1 / maxRate
+        self.smoothing = smoothing
+
+        self.target = None
+        self.level = None  # Smoothed level
+        self.sentLevel = None  # Last level sent to the backend
+        self.requests = 0  # Number of setTarget calls
+        self.updates = 0  # Number of backend calls
+
+        self._pending = False
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def setTarget(self, level):
+        """Set the desired volume level (0.0 to 1.0). Cheap enough to call on every frame."""
+        level = min(max(float(level), 0.0), 1.0)
+        with self._condition:
+            self.requests += 1
+            self.target = level
+            self._pending = True
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                target = self.target
+
+            if self.level is None:
+                self.level = target
+            else:
+                self.level += self.smoothing * (target - self.level)
+            converged = abs(target - self.level) < self.deadband
+            if converged:
+                self.level = target
+
+            if self.sentLevel is None or abs(self.level - self.sentLevel) >= self.deadband:
+                self.backend.setVolume(self.level)
+                self.sentLevel = self.level
+                self.updates += 1
+                time.sleep(self.interval)
+
+            if converged:
+                with self._condition:
+                    # Only go idle if no new target arrived in the meantime
+                    if self.target == target:
+                        self._pending = False
+            elif self.sentLevel != self.level:
+                # Still smoothing inside the dead-band; keep stepping at the update rate
+                time.sleep(self.interval)
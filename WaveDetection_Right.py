@@ -1,31 +1,35 @@
 import cv2
 import time
 import HandTrackingModule as HTM
+from CameraManager import openCamera
+from Profiler import FrameProfiler
 
 class WaveDetector:
-    def __init__(self, max_positions=30, threshold=15):
+    def __init__(self, max_positions=30, threshold=15, modelComplexity=1):
         """
         Initialize the WaveDetector class.
         Args:
             max_positions: Number of previous frames to store for x-axis movement tracking.
             threshold: Minimum distance (in pixels) between left-right movements to count as a wave.
+            modelComplexity: Landmark model complexity of the hand detector (0 = lite, 1 = full).
         """
         self.max_positions = max_positions  # Maximum number of frames to track
         self.threshold = threshold  # Movement threshold for detecting direction change
         self.x_positions = []  # List to store x-axis positions of the index finger tip
-        self.detector = HTM.HandDetector()  # Hand tracking module instance
+        self.detector = HTM.HandDetector(modelComplexity=modelComplexity)  # Hand tracking module instance
         self.pTime = 0  # Initialize pTime for FPS calculation
 
-    def detectWave(self, img):
+    def detectWave(self, img, timestamp=None):
         """
         Detects hand wave based on the movement in x-axis.
         Args:
             img: The current frame from the video feed.
+            timestamp: Capture position of the frame in ms, see HandDetector.findHands.
         Returns:
             bool: True if a wave is detected, otherwise False.
         """
         # Process the frame to detect the hand and find positions
-        img = self.detector.findHands(img)
+        img = self.detector.findHands(img, timestamp=timestamp)
         lmList = self.detector.findPosition(img, draw=False)
 
         if len(lmList) != 0:
@@ -62,15 +66,16 @@ class WaveDetector:
         # Return True if at least 2 direction changes are detected
         return wave_count >= 2
 
-    def processFrame(self, img):
+    def processFrame(self, img, timestamp=None):
         """
         Process the current frame to detect a wave gesture.
         Args:
             img: The current frame from the video feed.
+            timestamp: Capture position of the frame in ms, see HandDetector.findHands.
         Returns:
             img: The annotated frame with detection results.
         """
-        img = self.detector.findHands(img)
+        img = self.detector.findHands(img, timestamp=timestamp)
         lmList = self.detector.findPosition(img, draw=False)
 
         # Detect the hand and check if it's the right hand (by analyzing handedness)
@@ -107,15 +112,18 @@ class WaveDetector:
         Main loop to run the wave detection.
         Captures video feed, processes frames, and displays results.
         """
-        cap = cv2.VideoCapture(0)
+        cap = openCamera()
 
+        profiler = FrameProfiler.fromEnv()
         while True:
+            profiler.frameStart()
             success, img = cap.read()
             if not success:
                 print("Failed to read from camera.")
                 break
 
-            img = self.processFrame(img)
+            with profiler.stage("inference"):
+                img = self.processFrame(img, cap.get(cv2.CAP_PROP_POS_MSEC))
 
             # FPS Calculation
             cTime = time.time()
@@ -126,9 +134,12 @@ class WaveDetector:
             # Show the frame with annotations
             cv2.imshow("Wave Detection", img)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            key = cv2.waitKey(1) & 0xFF
+            profiler.frameEnd(key)
+            if key == ord('q'):
                 break
 
+        profiler.close()
         cap.release()
         cv2.destroyAllWindows()
 
@@ -1,121 +1,211 @@
 import os
+import logging
 import tkinter as tk
 import cv2
-import mediapipe as mp
 import Act, Sense, Think
 from FingerCounting import FingerCounter
 from WaveDetection_Right import WaveDetector
 from FullGrip import GripDetector
+from AutoTuner import AutoTuner
+from CameraManager import openCamera
+from MotionGate import MotionGate
+from FrameBufferPool import FrameBufferPool
+from LandmarkBackends import createBackend, drawLandmarks
+from PresenceMonitor import PresenceMonitor
+from Profiler import FrameProfiler
+from SessionRecorder import SessionRecorder
+from SessionScheduler import SessionScheduler, loadPlan
 import time
 
 # Suppress TensorFlow Lite warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-# Initialize MediaPipe hands and drawing utils
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-
-# Initialize components
-sense = Sense.Sense()
-act = Act.Act()
-think = Think.Think(act)
-wave_detector = WaveDetector()
-full_grip_detector = GripDetector()
-finger_counter = FingerCounter()
+# Initialize components. The landmark backend, sound, scheduler and GUI are created in main(): processes
+# started with the spawn method (Windows, macOS), e.g. by $SELINSEV_CAPTURE=shared, re-import this module.
+tuner = AutoTuner(targetFps=15)
+sense = act = think = profiler = recorder = scheduler = None
+motion_gate = MotionGate()
+frame_pool = FrameBufferPool()  # Capture, resize and color conversion buffers reused across frames
+presence = PresenceMonitor(idleAfter=5.0, idleFps=2)  # Low-rate, low-resolution detection while no hand is in view
+root = message_label = start_button = next_button = None
 
 # Flags to track exercise state
-current_exercise = 0
-current_level = 1
 cap = None
-required_repetitions = 3
 repetitions_completed = 0
 draw_interval = 5
-finger_sequence = [0, 1, 2, 3, 4, 5]
+motion_gating = True  # Reuse the previous landmarks on frames that barely changed
+base_dir = os.path.dirname(os.path.abspath(__file__))
+plan_path = os.path.join(base_dir, "session_plan.json")
+
+
+def prepare_hand_detector(detector):
+    """Apply motion gating to a newly created hand detector."""
+    if motion_gating:
+        detector.motionGate = MotionGate()
+
+
+# Exercise factories run on the scheduler's background thread while the previous exercise is running,
+# so detector construction and asset loading do not delay the switch.
+def create_instruction_exercise(spec):
+    return None  # Uses the shared Sense/Think/Act components
+
+
+def create_wave_exercise(spec):
+    wave_detector = WaveDetector(max_positions=spec.get("maxPositions", 30), threshold=spec.get("threshold", 15),
+                                 modelComplexity=tuner.modelComplexity)
+    prepare_hand_detector(wave_detector.detector)
+    return wave_detector
+
+
+def create_grip_exercise(spec):
+    grip_detector = GripDetector(spec.get("closedRatios"), spec.get("openRatios"), spec.get("bendScore", 0.5),
+                                 modelComplexity=tuner.modelComplexity)
+    prepare_hand_detector(grip_detector.detector)
+    return grip_detector
+
+
+def create_finger_count_exercise(spec):
+    finger_counter = FingerCounter(detectionCon=spec.get("detectionCon", 0.8),
+                                   folderPath=os.path.join(base_dir, "FingerImages"),
+                                   modelComplexity=tuner.modelComplexity)
+    prepare_hand_detector(finger_counter.detector)
+    return finger_counter
 
 
 def start_exercise():
-    global current_exercise, repetitions_completed, current_level, finger_sequence
-    current_exercise = 0
+    global repetitions_completed
     repetitions_completed = 0
-    current_level = 1
-    finger_sequence = [0, 1, 2, 3, 4, 5]  # Reset the finger sequence
-    message_label.config(text="Starting Level 1")
     start_button.pack_forget()
-    root.after(500, run_exercise)
+    try:
+        spec = scheduler.start()
+    except Exception as e:
+        logging.exception("Could not prepare the first exercise")
+        message_label.config(text=f"Could not load the exercise: {e}")
+        start_button.pack(pady=10)
+        return
+    message_label.config(text=f"Starting {spec['levelName']}")
+    root.after_idle(run_exercise)
 
 
 def next_exercise():
-    global current_exercise, repetitions_completed, current_level
-    current_exercise += 1
+    global repetitions_completed
+    previous = scheduler.spec
     repetitions_completed = 0
+    next_button.pack_forget()
+    try:
+        spec = scheduler.advance()
+    except Exception as e:
+        # The scheduler stays on the finished exercise, so the button retries preparing the next one
+        logging.exception("Could not prepare the next exercise")
+        message_label.config(text=f"Could not load the next exercise: {e}")
+        next_button.pack()
+        return
+
+    if spec is None:
+        message_label.config(text="All exercises are complete!")
+        return
 
-    if current_level == 1:
-        if current_exercise < 6:
-            message_label.config(text=f"Starting Level 1 Exercise {current_exercise + 1}...")
-            root.after(500, run_exercise)
-        else:
-            current_level = 2
-            current_exercise = 0
-            message_label.config(text="Level 1 complete! Moving to Level 2: Wave, Grip, Finger Counting...")
-            root.after(500, run_exercise)
+    if spec["level"] != previous["level"]:
+        description = f": {spec['levelDescription']}" if spec["levelDescription"] else ""
+        message_label.config(text=f"{previous['levelName']} complete! Moving to {spec['levelName']}{description}...")
     else:
-        if current_exercise < 3:
-            message_label.config(text=f"Starting Level 2 Exercise {current_exercise + 1}...")
-            root.after(500, run_exercise)
-        else:
-            message_label.config(text="All exercises are complete!")
-            next_button.pack_forget()
+        message_label.config(text=f"Starting {spec['levelName']} Exercise {spec['exercise']}...")
+    root.after_idle(run_exercise)
 
 
 def run_exercise():
-    global cap, repetitions_completed, current_level, current_exercise
+    global cap
 
-    if current_level == 1 and current_exercise >= 6 or current_level == 2 and current_exercise >= 3:
+    spec = scheduler.spec
+    if spec is None:
         message_label.config(text="All exercises are complete!")
         return
 
     if cap is None or not cap.isOpened():
-        cap = cv2.VideoCapture(0)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 320)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
-        cap.set(cv2.CAP_PROP_FPS, 15)
+        # Shared, MJPG-negotiated handle ($SELINSEV_CAMERA selects the device or a video file;
+        # $SELINSEV_CAPTURE=shared decodes it in a separate process, handing frames over through shared memory)
+        cap = openCamera(width=tuner.level["width"], height=tuner.level["height"], fps=tuner.targetFps)
 
     if not cap.isOpened():
         message_label.config(text="Error: Camera not detected.")
         return
 
+    # The exercise was prepared in the background and the tuner may have changed level since
+    exercise = scheduler.current
+    if exercise is not None:
+        exercise.detector.setModelComplexity(tuner.modelComplexity)
+
     movement_completed = False
     feedback_message = ""
-
-    with mp_hands.Hands(max_num_hands=1) as hands:
-        while cap.isOpened() and not movement_completed:
-            ret, frame = cap.read()
-            if not ret:
-                message_label.config(text="Failed to grab frame")
-                break
-
-            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-
+    run_step = exercise_steps[spec["type"]]
+
+    results = None
+    motion_gate.reset()
+    if recorder is not None:
+        recorder.rotate(f"level{spec['level']}_exercise{spec['exercise']}")
+    while cap.isOpened() and not movement_completed:
+        presence.waitForNextFrame(cap)
+        profiler.frameStart()
+        with profiler.stage("capture"):
+            ret, frame = frame_pool.read(cap)
+            capture_time = time.perf_counter()
+        if not ret:
+            # A lost camera is reopened by later reads, so the Tk loop keeps running and retries on its next tick
+            message_label.config(text="Camera lost, reconnecting..." if cap.reconnecting else "Failed to grab frame")
+            break
+        # Capture position, which keeps replay and synthetic landmark backends in step with skipped frames
+        timestamp = cap.get(cv2.CAP_PROP_POS_MSEC)
+
+        # The tuner is fed the processing time only; the capture read blocks on the camera's frame rate and
+        # waitKey on the display, so loop time could never show headroom above the target
+        processing_start = time.perf_counter()
+        with profiler.stage("inference"):
+            inferred = not motion_gating or results is None or motion_gate.shouldInfer(frame)
+            if inferred:
+                inference_input = presence.prepareInput(tuner.prepareInput(frame, frame_pool), frame_pool)
+                results = sense.process(frame_pool.cvtColor(inference_input, cv2.COLOR_BGR2RGB, "rgb"), timestamp)
+        processing_time = time.perf_counter() - processing_start
+        idle = presence.update(bool(results.multi_hand_landmarks))
+
+        with profiler.stage("draw_landmarks"):
             if results.multi_hand_landmarks:
                 for hand_landmarks in results.multi_hand_landmarks:
-                    mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-            if current_level == 1:
-                movement_completed, feedback_message = run_level1_exercise(frame, results)
-            elif current_level == 2:
-                movement_completed, feedback_message = run_level2_exercise(frame)
-
-            cv2.putText(frame, f"Level {current_level} Exercise {current_exercise + 1}", (10, 30),
+                    drawLandmarks(frame, hand_landmarks)
+
+        exercise_start = time.perf_counter()
+        with profiler.stage("exercise"):
+            if idle:
+                feedback_message = "Show your hand to continue"
+            else:
+                movement_completed, feedback_message = run_step(spec, scheduler.current, frame, results, timestamp)
+        processing_time += time.perf_counter() - exercise_start
+
+        with profiler.stage("display"):
+            cv2.putText(frame, f"{spec['levelName']} Exercise {spec['exercise']}", (10, 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2, cv2.LINE_AA)
-            cv2.putText(frame, f"Repetitions left: {len(finger_sequence) - repetitions_completed}", (10, 60),
+            cv2.putText(frame, f"Repetitions left: {spec['repetitions'] - repetitions_completed}", (10, 60),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2, cv2.LINE_AA)
             cv2.putText(frame, feedback_message, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2,
                         cv2.LINE_AA)
+            if motion_gating:
+                cv2.putText(frame, f"Inference skipped: {motion_gate.gatedRatio:.0%}", (10, 120),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
 
             cv2.imshow('Exercise', frame)
+            key = cv2.waitKey(10) & 0xFF
+
+        if recorder is not None:
+            with profiler.stage("record"):
+                recorder.submit(frame, capture_time)
+
+        profiler.frameEnd(key)
+        if key == ord('q'):
+            break
 
-            if cv2.waitKey(10) & 0xFF == ord('q'):
-                break
+        # Idle frames are throttled and downscaled on purpose and gated frames skip inference, so neither says
+        # anything about the tuning level
+        if inferred and not idle and tuner.update(processing_time, AutoTuner.confidenceFromResults(results)):
+            apply_tuning()
 
     if movement_completed:
         message_label.config(text="Exercise completed! Click 'Next Exercise'.")
@@ -124,9 +214,18 @@ def run_exercise():
         root.after(10, run_exercise)
 
 
-def run_level1_exercise(frame, results):
+def apply_tuning():
+    """Apply the tuner's current capture resolution and model complexity to the camera and detectors."""
+    tuner.applyCapture(cap)
+    sense.backend.setModelComplexity(tuner.modelComplexity)
+    exercise = scheduler.current
+    if exercise is not None:
+        exercise.detector.setModelComplexity(tuner.modelComplexity)
+
+
+def run_instruction_exercise(spec, exercise, frame, results, timestamp):
     global repetitions_completed
-    current_instruction = act.get_instruction(current_exercise)
+    current_instruction = spec["instruction"]
 
     if results.multi_hand_landmarks:
         movements = sense.extract_hand_movements(results.multi_hand_landmarks[0])
@@ -137,56 +236,118 @@ def run_level1_exercise(frame, results):
         if think.get_state() == "Correct":
             repetitions_completed += 1
 
-    return repetitions_completed >= required_repetitions, current_instruction
+    return repetitions_completed >= spec["repetitions"], current_instruction
+
 
+def run_wave_exercise(spec, wave_detector, frame, results, timestamp):
+    global repetitions_completed
 
-def run_level2_exercise(frame):
-    global repetitions_completed, finger_sequence
+    # Wave Detection
+    wave_detected = wave_detector.detectWave(frame, timestamp)
+    feedback_message = "Wave detected!" if wave_detected else "Keep waving..."
+    if wave_detected:
+        repetitions_completed += 1
+
+    return repetitions_completed >= spec["repetitions"], feedback_message
 
-    feedback_message = ""
 
-    if current_exercise == 0:
-        # Wave Detection
-        wave_detected = wave_detector.detectWave(frame)
-        feedback_message = "Wave detected!" if wave_detected else "Keep waving..."
-        if wave_detected:
+def run_grip_exercise(spec, grip_detector, frame, results, timestamp):
+    global repetitions_completed
+
+    # Full Grip Detection
+    feedback_message = ""
+    lmList = grip_detector.lmlist(frame, timestamp)
+    if lmList:
+        grip_detected = grip_detector.detectFullGrip(lmList)
+        feedback_message = "Grip detected!" if grip_detected else "Try to make a full grip..."
+        if grip_detected:
             repetitions_completed += 1
-    elif current_exercise == 1:
-        # Full Grip Detection
-        lmList = full_grip_detector.lmlist(frame)
-        if lmList:
-            grip_detected = full_grip_detector.detectFullGrip(lmList)
-            feedback_message = "Grip detected!" if grip_detected else "Try to make a full grip..."
-            if grip_detected:
-                repetitions_completed += 1
-    elif current_exercise == 2:
-        # Finger Counting
-        FingerCounter.run()
 
+    return repetitions_completed >= spec["repetitions"], feedback_message
 
-# GUI Setup
-root = tk.Tk()
-root.title("Exercise Coach")
-root.geometry("400x300")
-root.configure(bg="#f0f0f0")
 
-message_label = tk.Label(root, text="Welcome to the Exercise Coach!", font=("Arial", 14, "bold"), bg="#f0f0f0")
-message_label.pack(pady=20)
+def run_finger_count_exercise(spec, finger_counter, frame, results, timestamp):
+    global repetitions_completed
+
+    # Finger Counting: show each number of fingers of the sequence in turn
+    sequence = spec["sequence"]
+    target = sequence[repetitions_completed % len(sequence)]
+    feedback_message = f"Show {target} fingers"
+    lmList = finger_counter.lmlist(frame, timestamp)
+    if lmList:
+        value = finger_counter.countFingers(lmList)
+        finger_counter.displayOverlay(value, frame)
+        if value == target:
+            repetitions_completed += 1
+            feedback_message = "Correct!"
 
-start_button = tk.Button(root, text="Start Exercise", font=("Arial", 12), command=start_exercise, bg="#4CAF50",
-                         fg="white")
-start_button.pack(pady=10)
+    return repetitions_completed >= spec["repetitions"], feedback_message
 
-next_button = tk.Button(root, text="Next Exercise", font=("Arial", 12), command=next_exercise, bg="#008CBA", fg="white")
-next_button.pack_forget()
+
+exercise_steps = {
+    "instruction": run_instruction_exercise,
+    "wave": run_wave_exercise,
+    "grip": run_grip_exercise,
+    "finger_count": run_finger_count_exercise,
+}
 
 
 def on_closing():
+    profiler.close()
+    if motion_gating:
+        print(f"Motion gating: {motion_gate.gatedFrames} frames gated, {motion_gate.inferredFrames} inferred")
+    print(f"Frame buffers: {frame_pool.allocations} allocations, {frame_pool.reuses} reuses, "
+          f"{frame_pool.nbytes // 1024} KiB")
+    print(f"Presence duty cycling: {presence.summary()}")
+    if recorder is not None:
+        recorder.close()
+        print(recorder.report())
+    scheduler.shutdown()
+    sense.close()
     if cap and cap.isOpened():
+        print(cap.report())
         cap.release()
     cv2.destroyAllWindows()
     root.quit()
 
 
-root.protocol("WM_DELETE_WINDOW", on_closing)
-root.mainloop()
\ No newline at end of file
+def main():
+    global sense, act, think, profiler, recorder, scheduler, root, message_label, start_button, next_button
+    logging.basicConfig(level=logging.INFO)
+
+    # Landmarks come from $SELINSEV_BACKEND (MediaPipe by default, or e.g. synthetic / replay:<file.npz>)
+    sense = Sense.Sense(createBackend(maxHands=1, modelComplexity=tuner.modelComplexity))
+    act = Act.Act()
+    think = Think.Think(act)
+    profiler = FrameProfiler.fromEnv()  # SELINSEV_PROFILE=<seconds> or the 'p' key in the exercise window
+    recorder = SessionRecorder.fromEnv()  # Annotated recordings per exercise when SELINSEV_RECORD_DIR is set
+    scheduler = SessionScheduler(loadPlan(plan_path), {
+        "instruction": create_instruction_exercise,
+        "wave": create_wave_exercise,
+        "grip": create_grip_exercise,
+        "finger_count": create_finger_count_exercise,
+    })
+
+    # GUI Setup
+    root = tk.Tk()
+    root.title("Exercise Coach")
+    root.geometry("400x300")
+    root.configure(bg="#f0f0f0")
+
+    message_label = tk.Label(root, text="Welcome to the Exercise Coach!", font=("Arial", 14, "bold"), bg="#f0f0f0")
+    message_label.pack(pady=20)
+
+    start_button = tk.Button(root, text="Start Exercise", font=("Arial", 12), command=start_exercise, bg="#4CAF50",
+                             fg="white")
+    start_button.pack(pady=10)
+
+    next_button = tk.Button(root, text="Next Exercise", font=("Arial", 12), command=next_exercise, bg="#008CBA",
+                            fg="white")
+    next_button.pack_forget()
+
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
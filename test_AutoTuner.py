@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("cv2")
+from AutoTuner import AutoTuner
+
+
+def simulate(tuner, costs, frames):
+    """Feed the tuner the fixed processing time of its current level. Returns the level of every frame."""
+    levels = []
+    for _ in range(frames):
+        tuner.update(costs[tuner.levelIndex])
+        levels.append(tuner.levelIndex)
+    return levels
+
+
+def test_level_settles_between_unsustainable_neighbours():
+    # Level 2 runs at 20 fps (above the 19.5 fps step-up limit), level 3 at 11.1 fps (below the 13.5 fps
+    # step-down limit), so without backing off the tuner alternates between them every 90 frames
+    tuner = AutoTuner(targetFps=15)
+    levels = simulate(tuner, [0.020, 0.030, 0.050, 0.090, 0.120], 10000)
+
+    changes = sum(1 for a, b in zip(levels, levels[1:]) if a != b)
+    assert changes <= 10
+    assert levels[-1] == 2
+    assert levels.count(2) / len(levels) > 0.95
+
+
+def test_sustainable_step_up_is_kept():
+    tuner = AutoTuner(targetFps=15)
+    levels = simulate(tuner, [0.010, 0.010, 0.020, 0.030, 0.040], 1000)
+
+    assert levels[-1] == 4
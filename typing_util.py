@@ -1,11 +1,41 @@
 import tkinter as tk
 import time
 import random
+import json
+from array import array
+
+
+class KeystrokeLog:
+    def __init__(self, size=4096):
+        """
+        Preallocated ring buffer of keystroke timestamps.
+        Args:
+            size: Number of keystrokes kept before the oldest are overwritten.
+        """
+        self.size = size
+        self.timestamps = array('q', bytes(8 * size))  # perf_counter_ns values
+        self.count = 0  # Total number of keystrokes recorded
+
+    def record(self, timestamp_ns):
+        self.timestamps[self.count % self.size] = timestamp_ns
+        self.count += 1
+
+    def since(self, start_count):
+        """Return the timestamps recorded since the given count, oldest first (at most size of them)."""
+        first = max(start_count, self.count - self.size)
+        return [self.timestamps[i % self.size] for i in range(first, self.count)]
+
 
 class TypingPractice:
-    def __init__(self, root):
+    # Upper edges of the inter-key interval histogram bins in milliseconds; the last bin is open-ended
+    interval_bins_ms = [100, 200, 300, 400, 500, 750, 1000, 1500, 2000]
+    # Minimum delay between feedback label updates (about one display frame)
+    frame_ms = 16
+
+    def __init__(self, root, export_path=None):
         self.root = root
         self.root.title("Typing Practice for Stroke Rehabilitation")
+        self.export_path = export_path  # Optional JSON Lines file receiving per-sentence metrics
 
         # List of sentences for practice
         self.sentences = [
@@ -21,12 +51,28 @@ class TypingPractice:
         self.start_time = None
         self.user_input = tk.StringVar()
 
+        # Incremental matching state: length of the typed text and of its prefix matching the target
+        self.typed_length = 0
+        self.matched_length = 0
+        self.error_positions = []
+        self.keystrokes = KeystrokeLog()
+        self.sentence_start_count = 0
+        self.sentence_metrics = []
+
+        # Coalesced feedback label updates
+        self.pending_feedback = None
+        self.shown_feedback = None
+        self.flush_scheduled = False
+
         # Display the target text
         self.label = tk.Label(root, text="", font=("Helvetica", 14))
         self.label.pack(pady=20)
 
-        # Input field where the user will type
-        self.entry = tk.Entry(root, textvariable=self.user_input, font=("Helvetica", 14), width=50)
+        # Input field where the user will type. The validate command sees every edit
+        # (insert/delete, index and text) before it is applied, so matching is incremental.
+        self.entry = tk.Entry(root, textvariable=self.user_input, font=("Helvetica", 14), width=50,
+                              validate="key",
+                              validatecommand=(root.register(self.on_edit), "%d", "%i", "%S", "%P"))
         self.entry.pack(pady=10)
         self.entry.bind("<KeyRelease>", self.check_typing)
 
@@ -41,33 +87,115 @@ class TypingPractice:
     def start_typing(self):
         """Start the typing exercise"""
         self.user_input.set("")
-        self.start_time = time.time()
+        self.typed_length = 0
+        self.matched_length = 0
+        self.error_positions = []
+        self.sentence_start_count = self.keystrokes.count
+        self.start_time = time.perf_counter_ns()
 
         # Select a new sentence randomly
         self.current_sentence = random.choice(self.sentences)
         self.label.config(text=self.current_sentence)
-        self.feedback_label.config(text="Start typing now...")
+        self.set_feedback("Start typing now...")
+
+    def on_edit(self, action, index, text, proposed):
+        """Record a keystroke and update the matched prefix. Called by Tk before each edit is applied."""
+        if self.start_time is None:
+            return True
+        self.keystrokes.record(time.perf_counter_ns())
+
+        index = int(index)
+        if action == "1":  # Insertion
+            if index == self.typed_length == self.matched_length:
+                # Appending to a fully matching text: only the new characters are compared
+                expected = self.current_sentence[index:index + len(text)]
+                matched = 0
+                while matched < len(text) and matched < len(expected) and text[matched] == expected[matched]:
+                    matched += 1
+                self.matched_length += matched
+                if matched < len(text):
+                    self.error_positions.append(self.matched_length)
+            elif index <= self.matched_length:
+                # Inserting inside the matched prefix shifts the rest, so it is re-checked from the edit point
+                self.matched_length = self._match_from(proposed, index)
+                if self.matched_length < index + len(text):
+                    self.error_positions.append(self.matched_length)
+            self.typed_length += len(text)
+        elif action == "0":  # Deletion
+            self.typed_length -= len(text)
+            if index <= self.matched_length:
+                # Backspace at the end leaves nothing to re-check, so this is O(1) in the common case
+                self.matched_length = self._match_from(proposed, index)
+        return True
+
+    def _match_from(self, text, start):
+        """Return the length of the prefix of text matching the target, given the first start characters match."""
+        matched = start
+        limit = min(len(text), len(self.current_sentence))
+        while matched < limit and text[matched] == self.current_sentence[matched]:
+            matched += 1
+        return matched
 
     def check_typing(self, event):
         """Check user typing and provide feedback"""
         if self.start_time is None:
             return  # Ignore key presses until the user starts the exercise
 
-        typed_text = self.user_input.get()
-
         # Check if typing is complete
-        if typed_text == self.current_sentence:
-            elapsed_time = time.time() - self.start_time
+        if self.matched_length == self.typed_length == len(self.current_sentence):
+            elapsed_time = (time.perf_counter_ns() - self.start_time) / 1e9
             speed = len(self.current_sentence) / elapsed_time * 60  # characters per minute (CPM)
-            self.feedback_label.config(
-                text=f"Great! You completed in {elapsed_time:.2f} seconds at {speed:.2f} CPM."
-            )
+            self.set_feedback(f"Great! You completed in {elapsed_time:.2f} seconds at {speed:.2f} CPM.")
+            self.export_sentence(elapsed_time, speed)
+            self.start_time = None
             # Show a button to allow retrying with a new sentence
             self.start_button.config(text="Type Another Sentence", command=self.start_typing)
-        elif not self.current_sentence.startswith(typed_text):
-            self.feedback_label.config(text="Error: Typing does not match the target text.")
+        elif self.matched_length < self.typed_length:
+            self.set_feedback("Error: Typing does not match the target text.")
         else:
-            self.feedback_label.config(text="Keep going...")
+            self.set_feedback("Keep going...")
+
+    def set_feedback(self, text):
+        """Queue a feedback label update; updates are applied at most once per display frame."""
+        self.pending_feedback = text
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.root.after(self.frame_ms, self.flush_feedback)
+
+    def flush_feedback(self):
+        self.flush_scheduled = False
+        if self.pending_feedback != self.shown_feedback:
+            self.feedback_label.config(text=self.pending_feedback)
+            self.shown_feedback = self.pending_feedback
+
+    def interval_histogram(self, timestamps):
+        """Count inter-key intervals per bin of interval_bins_ms (last count is for longer intervals)."""
+        counts = [0] * (len(self.interval_bins_ms) + 1)
+        for previous, current in zip(timestamps, timestamps[1:]):
+            interval_ms = (current - previous) / 1e6
+            bin_index = 0
+            while bin_index < len(self.interval_bins_ms) and interval_ms >= self.interval_bins_ms[bin_index]:
+                bin_index += 1
+            counts[bin_index] += 1
+        return counts
+
+    def export_sentence(self, elapsed_time, speed):
+        """Store the metrics of the completed sentence and append them to export_path if set."""
+        timestamps = self.keystrokes.since(self.sentence_start_count)
+        metrics = {
+            "sentence": self.current_sentence,
+            "elapsed_s": elapsed_time,
+            "cpm": speed,
+            "keystrokes": self.keystrokes.count - self.sentence_start_count,
+            "error_positions": self.error_positions,
+            "interval_bins_ms": self.interval_bins_ms,
+            "interval_histogram": self.interval_histogram(timestamps),
+        }
+        self.sentence_metrics.append(metrics)
+        if self.export_path:
+            with open(self.export_path, "a") as f:
+                f.write(json.dumps(metrics) + "\n")
+        return metrics
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -2,6 +2,8 @@
 import cv2
 import time
 import HandTrackingModule as HTM
+from CameraManager import openCamera
+from Profiler import FrameProfiler
 
 
 def detectWave(x_positions, threshold=30):
@@ -30,19 +32,22 @@ def detectWave(x_positions, threshold=30):
 def main():
     pTime = 0
     cTime = 0
-    cap = cv2.VideoCapture(0)  # Change to correct camera index
+    cap = openCamera()  # $SELINSEV_CAMERA selects another camera index or a video file
     detector = HTM.HandDetector()
 
     # To store x positions of the tip of the index finger (landmark 8)
     x_positions = []
 
+    profiler = FrameProfiler.fromEnv()
     while True:
+        profiler.frameStart()
         success, img = cap.read()
         if not success:
             print("Failed to read from camera.")
             break
 
-        img = detector.findHands(img)
+        with profiler.stage("inference"):
+            img = detector.findHands(img, timestamp=cap.get(cv2.CAP_PROP_POS_MSEC))
         lmList = detector.findPosition(img)
 
         # Detect the hand and check if it's the left hand (by analyzing handedness)
@@ -84,9 +89,12 @@ def main():
         cv2.putText(img, f"FPS: {int(fps)}", (10, 70), cv2.FONT_HERSHEY_COMPLEX, 1, (255, 0, 255), 2)
         cv2.imshow("Image", img)
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        key = cv2.waitKey(1) & 0xFF
+        profiler.frameEnd(key)
+        if key == ord('q'):
             break
 
+    profiler.close()
     cap.release()
     cv2.destroyAllWindows()
 